@@ -26,6 +26,8 @@ SERVER_ROLES = {
 # Moderation settings
 MUTE_ROLE_NAME = "Muted"
 DEFAULT_MUTE_DURATION = 3600  # 1 hour in seconds
+MAX_WARNING_BUCKETS = int(os.getenv("MAX_WARNING_BUCKETS", "10000"))  # members with warnings cached in memory (MongoDB mode only)
+MAX_WARNINGS_PER_USER = int(os.getenv("MAX_WARNINGS_PER_USER", "50"))  # older warnings are dropped
 
 # Gemini AI settings (loaded from env with fallback defaults)
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
@@ -0,0 +1,64 @@
+"""
+Shared JSON file helpers for the storage layers and cogs.
+Uses orjson when it is installed and falls back to the stdlib json module.
+"""
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
+
+def json_loads(data: bytes):
+    """Parse JSON bytes."""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj, indent: bool = False) -> bytes:
+    """Serialize obj to JSON bytes, compact unless indent is set. Non-string dict keys are allowed."""
+    if orjson:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    if indent:
+        return json.dumps(obj, indent=2).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def read_json_file(path: str):
+    """Parse a JSON file and return (data, blake2b digest). With orjson the file is parsed straight from an mmap."""
+    with open(path, 'rb') as f:
+        if not orjson or os.fstat(f.fileno()).st_size == 0:
+            raw = f.read()
+            return json_loads(raw), hashlib.blake2b(raw, digest_size=16).digest()
+        # The view must be released before the map can close
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return orjson.loads(view), hashlib.blake2b(view, digest_size=16).digest()
+
+
+def write_file_atomic(path: str, content: bytes):
+    """Replace a file through a fsynced temp file so a crash never leaves it half-written."""
+    # Unique temp name so concurrent writers of the same file can't interleave
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        f = os.fdopen(fd, 'wb')
+    except BaseException:
+        os.close(fd)
+        os.unlink(tmp_path)
+        raise
+    try:
+        with f:
+            f.write(content)
+            # Make sure the bytes are on disk before the rename makes them visible
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
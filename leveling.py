@@ -10,6 +10,8 @@ import logging
 import time
 import aiohttp
 import io
+import concurrent.futures
+import PIL
 from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageOps
 from urllib.parse import urlparse
 import datetime
@@ -52,6 +54,17 @@ class Leveling(commands.Cog):
         os.makedirs(self.fonts_dir, exist_ok=True)
         # os.makedirs(self.images_dir, exist_ok=True) # Not currently used
 
+        # Shared HTTP session for backgrounds, avatars and fonts (created in cog_load)
+        self.http_session: Optional[aiohttp.ClientSession] = None
+        # Caps concurrent background/avatar downloads when many cards are requested at once
+        self._download_limit = asyncio.Semaphore(8)
+        # Parsed fonts keyed by (file name, size); cleared when syncfonts adds files
+        self._fonts: Dict[tuple, ImageFont.ImageFont] = {}
+        # Leaderboard background + header bar per theme; renders draw on a copy
+        self._leaderboard_bases: Dict[str, Image.Image] = {}
+        # Worker threads for Pillow rendering (created in cog_load)
+        self._img_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
         self.load_data()
         self.save_task.start()
 
@@ -69,8 +82,28 @@ class Leveling(commands.Cog):
         Leveling.advanced_group.cog = self
 
 
-    def cog_unload(self):
+    async def cog_load(self):
+        # One pooled session keeps Discord CDN connections warm between renders
+        self.http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=32, keepalive_timeout=75)
+        )
+        self._img_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(4, os.cpu_count() or 2),
+            thread_name_prefix="cardgen"
+        )
+        # Pillow-SIMD versions carry a ".postN" suffix
+        if ".post" in PIL.__version__:
+            logger.info(f"Using Pillow-SIMD {PIL.__version__} for level cards")
+        else:
+            logger.warning(f"Using stock Pillow {PIL.__version__}; install pillow-simd for faster level card rendering")
+
+    async def cog_unload(self):
         self.save_task.cancel()
+        await self.storage.close()
+        if self.http_session:
+            await self.http_session.close()
+        if self._img_pool:
+            self._img_pool.shutdown(wait=False)
 
     # --- Basic Level Commands (Directly under /level) ---
 
@@ -686,36 +719,35 @@ class Leveling(commands.Cog):
              await interaction.followup.send("Invalid URL format.", ephemeral=True); return
 
         try:
-            async with aiohttp.ClientSession() as session:
-                 async with session.head(image_url, timeout=10) as head_resp:
-                     # ... (HEAD request checks) ...
-                     if head_resp.status != 200: await interaction.followup.send(f"URL inaccessible (Status: {head_resp.status}).", ephemeral=True); return
-                     content_type = head_resp.headers.get('Content-Type', '').lower()
-                     if not content_type.startswith('image/'): await interaction.followup.send("URL is not an image.", ephemeral=True); return
-                     content_length = int(head_resp.headers.get('Content-Length', -1))
-                     if content_length > 8 * 1024 * 1024: await interaction.followup.send("Image too large (>8MB).", ephemeral=True); return
-
-                 async with session.get(image_url, timeout=15) as resp:
-                    if resp.status != 200: await interaction.followup.send(f"Download failed (Status: {resp.status}).", ephemeral=True); return
-                    image_data = await resp.read()
+            async with self.http_session.head(image_url, timeout=10) as head_resp:
+                 # ... (HEAD request checks) ...
+                 if head_resp.status != 200: await interaction.followup.send(f"URL inaccessible (Status: {head_resp.status}).", ephemeral=True); return
+                 content_type = head_resp.headers.get('Content-Type', '').lower()
+                 if not content_type.startswith('image/'): await interaction.followup.send("URL is not an image.", ephemeral=True); return
+                 content_length = int(head_resp.headers.get('Content-Length', -1))
+                 if content_length > 8 * 1024 * 1024: await interaction.followup.send("Image too large (>8MB).", ephemeral=True); return
+
+            async with self.http_session.get(image_url, timeout=15) as resp:
+                if resp.status != 200: await interaction.followup.send(f"Download failed (Status: {resp.status}).", ephemeral=True); return
+                image_data = await resp.read()
+                try:
+                    with Image.open(io.BytesIO(image_data)) as img:
+                         img.verify()
+                         if img.format not in ['PNG', 'JPEG', 'WEBP']: await interaction.followup.send("Unsupported format (Use PNG/JPG/WEBP).", ephemeral=True); return
+
+                    self.background_images[guild_id][user_id] = image_url
+                    await self.save_backgrounds()
                     try:
-                        with Image.open(io.BytesIO(image_data)) as img:
-                             img.verify()
-                             if img.format not in ['PNG', 'JPEG', 'WEBP']: await interaction.followup.send("Unsupported format (Use PNG/JPG/WEBP).", ephemeral=True); return
-
-                        self.background_images[guild_id][user_id] = image_url
-                        await self.save_backgrounds()
-                        try:
-                            card_bytes = await self.generate_preview_card(target_member, guild_id, user_id)
-                            file = discord.File(fp=card_bytes, filename="level_card_preview.png")
-                            await interaction.followup.send(f"✅ Background set for {target_member.mention}. Preview:", file=file, ephemeral=True)
-                        except Exception as card_err:
-                             logger.error(f"Error generating preview card: {card_err}")
-                             await interaction.followup.send(f"✅ Background set for {target_member.mention}. Preview failed.", ephemeral=True)
-
-                    except (IOError, SyntaxError) as pillow_err:
-                        logger.warning(f"Pillow verification failed for {image_url}: {pillow_err}")
-                        await interaction.followup.send("Invalid or corrupted image file.", ephemeral=True)
+                        card_bytes = await self.generate_preview_card(target_member, guild_id, user_id)
+                        file = discord.File(fp=card_bytes, filename="level_card_preview.png")
+                        await interaction.followup.send(f"✅ Background set for {target_member.mention}. Preview:", file=file, ephemeral=True)
+                    except Exception as card_err:
+                         logger.error(f"Error generating preview card: {card_err}")
+                         await interaction.followup.send(f"✅ Background set for {target_member.mention}. Preview failed.", ephemeral=True)
+
+                except (IOError, SyntaxError) as pillow_err:
+                    logger.warning(f"Pillow verification failed for {image_url}: {pillow_err}")
+                    await interaction.followup.send("Invalid or corrupted image file.", ephemeral=True)
 
         except asyncio.TimeoutError:
              await interaction.followup.send("Download timed out.", ephemeral=True)
@@ -840,17 +872,19 @@ class Leveling(commands.Cog):
         success, failed, skipped = 0, 0, 0
         os.makedirs(self.fonts_dir, exist_ok=True)
 
-        async with aiohttp.ClientSession() as session:
-            for font_file, font_url in fonts:
-                font_path = os.path.join(self.fonts_dir, font_file)
-                if os.path.exists(font_path): skipped += 1; continue
-                try:
-                    async with session.get(font_url, timeout=10) as resp:
-                        if resp.status == 200:
-                            with open(font_path, 'wb') as f: f.write(await resp.read()); success += 1
-                        else: logger.error(f"Font DL fail {font_file}: HTTP {resp.status}"); failed += 1
-                except asyncio.TimeoutError: logger.error(f"Font DL timeout {font_file}"); failed += 1
-                except Exception as e: logger.error(f"Font DL error {font_file}: {e}"); failed += 1
+        for font_file, font_url in fonts:
+            font_path = os.path.join(self.fonts_dir, font_file)
+            if os.path.exists(font_path): skipped += 1; continue
+            try:
+                async with self.http_session.get(font_url, timeout=10) as resp:
+                    if resp.status == 200:
+                        with open(font_path, 'wb') as f: f.write(await resp.read()); success += 1
+                    else: logger.error(f"Font DL fail {font_file}: HTTP {resp.status}"); failed += 1
+            except asyncio.TimeoutError: logger.error(f"Font DL timeout {font_file}"); failed += 1
+            except Exception as e: logger.error(f"Font DL error {font_file}: {e}"); failed += 1
+
+        if success:
+            self._fonts.clear()  # Replace cached fallbacks with the new files
 
         report = [f"## Font Sync Report", f"- Success: `{success}`", f"- Failed: `{failed}`", f"- Skipped: `{skipped}`"]
         await interaction.followup.send("\n".join(report), ephemeral=True)
@@ -1296,24 +1330,59 @@ class Leveling(commands.Cog):
 
         Returns a BytesIO PNG image.
         """
+        # Download images here; all Pillow work happens in _render_level_card
+        bg_data = None
+        bg_url = self.background_images.get(guild_id, {}).get(user_id)
+        if bg_url:
+            try:
+                async with self._download_limit, self.http_session.get(bg_url, timeout=10) as resp:
+                    if resp.status == 200:
+                        bg_data = await resp.read()
+            except Exception as e:
+                logger.warning(f"Failed to load background for {user_id}: {e}")
+
+        av_bytes = None
+        try:
+            async with self._download_limit:
+                av_bytes = await member.display_avatar.replace(format='png', size=256).read()
+        except Exception as e:
+            logger.debug(f"Avatar load failed for {member.id}: {e}")
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._img_pool, self._render_level_card,
+            bg_data, av_bytes, member.display_name, user_id, member.id,
+            level, xp, next_level_xp, percentage, rank, theme
+        )
+
+    def _render_level_card(
+        self,
+        bg_data: Optional[bytes],
+        av_bytes: Optional[bytes],
+        display_name: str,
+        user_id: str,
+        member_id: int,
+        level: int,
+        xp: int,
+        next_level_xp: int,
+        percentage: int,
+        rank: int,
+        theme: str
+    ) -> io.BytesIO:
+        """Draw a level card (blocking, runs in the image thread pool)."""
         # Canvas
         width, height = 800, 240
         card = Image.new("RGB", (width, height), (25, 29, 35))
         draw = ImageDraw.Draw(card)
 
         # Background handling
-        bg_url = self.background_images.get(guild_id, {}).get(user_id)
-        if bg_url:
+        if bg_data:
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(bg_url, timeout=10) as resp:
-                        if resp.status == 200:
-                            bg_data = await resp.read()
-                            with Image.open(io.BytesIO(bg_data)).convert("RGB") as bg:
-                                bg = bg.resize((width, height), Image.LANCZOS)
-                                # Subtle blur for readability
-                                bg = bg.filter(ImageFilter.GaussianBlur(radius=2))
-                                card.paste(bg)
+                with Image.open(io.BytesIO(bg_data)).convert("RGB") as bg:
+                    bg = bg.resize((width, height), Image.LANCZOS)
+                    # Subtle blur for readability
+                    bg = bg.filter(ImageFilter.GaussianBlur(radius=2))
+                    card.paste(bg)
             except Exception as e:
                 logger.warning(f"Failed to load background for {user_id}: {e}")
 
@@ -1336,40 +1405,28 @@ class Leveling(commands.Cog):
         # Avatar
         avatar_size = 128
         avatar_x, avatar_y = 24, (height - avatar_size) // 2
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(str(member.display_avatar.replace(format='png', size=256).url), timeout=10) as resp:
-                    if resp.status == 200:
-                        av_bytes = await resp.read()
-                        with Image.open(io.BytesIO(av_bytes)).convert("RGBA") as av:
-                            av = av.resize((avatar_size, avatar_size), Image.LANCZOS)
-                            # Make circular avatar
-                            mask = Image.new("L", (avatar_size, avatar_size), 0)
-                            ImageDraw.Draw(mask).ellipse((0, 0, avatar_size, avatar_size), fill=255)
-                            card.paste(av, (avatar_x, avatar_y), mask)
-        except Exception as e:
-            logger.debug(f"Avatar load failed for {member.id}: {e}")
-
-        # Fonts
-        def _font(name: str, size: int):
+        if av_bytes:
             try:
-                path = os.path.join(self.fonts_dir, name)
-                if os.path.exists(path):
-                    return ImageFont.truetype(path, size)
-            except Exception:
-                pass
-            return ImageFont.load_default()
+                with Image.open(io.BytesIO(av_bytes)).convert("RGBA") as av:
+                    av = av.resize((avatar_size, avatar_size), Image.LANCZOS)
+                    # Make circular avatar
+                    mask = Image.new("L", (avatar_size, avatar_size), 0)
+                    ImageDraw.Draw(mask).ellipse((0, 0, avatar_size, avatar_size), fill=255)
+                    card.paste(av, (avatar_x, avatar_y), mask)
+            except Exception as e:
+                logger.debug(f"Avatar load failed for {member_id}: {e}")
 
-        font_title = _font("Roboto-Bold.ttf", 32)
-        font_sub = _font("Roboto-Regular.ttf", 20)
-        font_small = _font("Roboto-Regular.ttf", 16)
+        # Fonts
+        font_title = self._get_font("Roboto-Bold.ttf", 32)
+        font_sub = self._get_font("Roboto-Regular.ttf", 20)
+        font_small = self._get_font("Roboto-Regular.ttf", 16)
 
         # Text positions
         text_x = avatar_x + avatar_size + 24
         text_y = 32
 
         # Primary line: username
-        name_text = member.display_name
+        name_text = display_name
         draw.text((text_x, text_y), name_text, fill=(255, 255, 255), font=font_title)
 
         # Secondary line: Level | Rank
@@ -1405,10 +1462,24 @@ class Leveling(commands.Cog):
 
         # Export to bytes
         out = io.BytesIO()
-        card.save(out, format="PNG", optimize=True)
+        card.save(out, format="PNG", compress_level=1)
         out.seek(0)
         return out
 
+    def _get_font(self, name: str, size: int):
+        """Return a font from fonts_dir, parsing each (name, size) only once."""
+        font = self._fonts.get((name, size))
+        if font is None:
+            font = ImageFont.load_default()
+            try:
+                path = os.path.join(self.fonts_dir, name)
+                if os.path.exists(path):
+                    font = ImageFont.truetype(path, size)
+            except Exception:
+                pass
+            self._fonts[(name, size)] = font
+        return font
+
     async def get_user_rank(self, guild_id: str, user_id: str) -> int:
         """Return the 1-based rank of the user by XP in the guild, or 0 if not found."""
         users = self.xp_data.get(guild_id, {})
@@ -1433,48 +1504,68 @@ class Leveling(commands.Cog):
         theme: str = "default"
     ) -> io.BytesIO:
         """Generate a simple visual leaderboard image for the page slice."""
-        width, height = 900, 520
-        img = Image.new("RGB", (width, height), (24, 26, 32))
-        draw = ImageDraw.Draw(img)
+        # Resolve display names here; the drawing runs in the image thread pool
+        start_idx = (page - 1) * per_page
+        end_idx = min(start_idx + per_page, len(sorted_users))
+        rows = []
+        for i in range(start_idx, end_idx):
+            user_id, data = sorted_users[i]
+            member = guild.get_member(int(user_id))
+            name = member.display_name if member else f"User {user_id}"
+            rows.append((i, name, data))
 
-        # Theme header bar
-        theme_colors = {
-            "default": (60, 65, 75),
-            "dark": (40, 44, 52),
-            "light": (210, 210, 210),
-            "blue": (37, 99, 235),
-            "green": (16, 95, 66),
-            "red": (153, 27, 27),
-            "purple": (126, 34, 206),
-            "gold": (146, 64, 14),
-        }
-        header_color = theme_colors.get(theme, theme_colors["default"])
-        draw.rectangle([0, 0, width, 76], fill=header_color)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._img_pool, self._render_leaderboard_image,
+            guild.name, rows, page, total_pages, theme
+        )
 
-        # Fonts
-        def _font(name: str, size: int):
-            try:
-                path = os.path.join(self.fonts_dir, name)
-                if os.path.exists(path):
-                    return ImageFont.truetype(path, size)
-            except Exception:
-                pass
-            return ImageFont.load_default()
+    def _leaderboard_base(self, theme: str) -> Image.Image:
+        """Return the leaderboard background with its theme header bar, drawn once per theme."""
+        base = self._leaderboard_bases.get(theme)
+        if base is None:
+            width, height = 900, 520
+            theme_colors = {
+                "default": (60, 65, 75),
+                "dark": (40, 44, 52),
+                "light": (210, 210, 210),
+                "blue": (37, 99, 235),
+                "green": (16, 95, 66),
+                "red": (153, 27, 27),
+                "purple": (126, 34, 206),
+                "gold": (146, 64, 14),
+            }
+            base = Image.new("RGB", (width, height), (24, 26, 32))
+            header_color = theme_colors.get(theme, theme_colors["default"])
+            ImageDraw.Draw(base).rectangle([0, 0, width, 76], fill=header_color)
+            self._leaderboard_bases[theme] = base
+        return base
+
+    def _render_leaderboard_image(
+        self,
+        guild_name: str,
+        rows: list,
+        page: int,
+        total_pages: int,
+        theme: str
+    ) -> io.BytesIO:
+        """Draw a leaderboard page (blocking, runs in the image thread pool)."""
+        img = self._leaderboard_base(theme).copy()
+        width = img.width
+        draw = ImageDraw.Draw(img)
 
-        title_font = _font("Roboto-Bold.ttf", 28)
-        row_font = _font("Roboto-Regular.ttf", 20)
-        small_font = _font("Roboto-Regular.ttf", 16)
+        # Fonts
+        title_font = self._get_font("Roboto-Bold.ttf", 28)
+        row_font = self._get_font("Roboto-Regular.ttf", 20)
+        small_font = self._get_font("Roboto-Regular.ttf", 16)
 
-        title = f"{guild.name} • Leaderboard (Page {page}/{total_pages})"
+        title = f"{guild_name} • Leaderboard (Page {page}/{total_pages})"
         draw.text((24, 22), title, fill=(255, 255, 255), font=title_font)
 
         # Rows
-        start_idx = (page - 1) * per_page
-        end_idx = min(start_idx + per_page, len(sorted_users))
         y = 100
         row_h = 76
-        for i in range(start_idx, end_idx):
-            user_id, data = sorted_users[i]
+        for i, name, data in rows:
             rank = i + 1
             xp = data.get("xp", 0)
             level = data.get("level", 0)
@@ -1487,10 +1578,6 @@ class Leveling(commands.Cog):
             draw.text((32, y), f"#{rank}", fill=(255, 255, 255), font=row_font)
 
             # Name
-            name = f"User {user_id}"
-            member = guild.get_member(int(user_id))
-            if member:
-                name = member.display_name
             draw.text((110, y), name, fill=(235, 235, 235), font=row_font)
 
             # Level / XP
@@ -1499,7 +1586,7 @@ class Leveling(commands.Cog):
             y += row_h
 
         out = io.BytesIO()
-        img.save(out, format="PNG", optimize=True)
+        img.save(out, format="PNG", compress_level=1)
         out.seek(0)
         return out
 
@@ -1,7 +1,6 @@
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
-import json
 import os
 import asyncio
 import random
@@ -10,17 +9,259 @@ import logging
 import time
 import aiohttp
 import io
-from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageOps
+from PIL import Image, ImageDraw, ImageFont, ImageFilter
 from urllib.parse import urlparse
 import datetime
+import bisect
+import concurrent.futures
+import threading
+import heapq
+import itertools
+import functools
+import string
+from cachetools import LRUCache, TTLCache
+from sortedcontainers import SortedList
+from jsonio import json_loads, json_dumps, write_file_atomic
 
 logger = logging.getLogger("bot")
 
+def _sniff_image_format(header: bytes) -> Optional[str]:
+    """Identify a background image from its first 12 bytes"""
+    if header[:8] == b'\x89PNG\r\n\x1a\n':
+        return "PNG"
+    if header[:3] == b'\xff\xd8\xff':
+        return "JPEG"
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return "WEBP"
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return "GIF"
+    return None
+
+# Level card theme colors
+_CARD_THEMES = {
+    "default": {
+        "bg": (47, 49, 54, 255),
+        "overlay": (0, 0, 0, 128),
+        "progress_bg": (100, 100, 100, 128),
+        "progress_fill": (88, 101, 242, 255),  # Discord blurple
+        "text": (255, 255, 255, 255)
+    },
+    "dark": {
+        "bg": (30, 30, 30, 255),
+        "overlay": (0, 0, 0, 180),
+        "progress_bg": (50, 50, 50, 180),
+        "progress_fill": (100, 100, 100, 255),
+        "text": (220, 220, 220, 255)
+    },
+    "light": {
+        "bg": (240, 240, 240, 255),
+        "overlay": (255, 255, 255, 180),
+        "progress_bg": (200, 200, 200, 180),
+        "progress_fill": (150, 150, 150, 255),
+        "text": (30, 30, 30, 255)
+    },
+    "blue": {
+        "bg": (53, 109, 187, 255),
+        "overlay": (0, 0, 128, 120),
+        "progress_bg": (70, 130, 180, 150),
+        "progress_fill": (30, 144, 255, 255),
+        "text": (255, 255, 255, 255)
+    },
+    "green": {
+        "bg": (46, 139, 87, 255),
+        "overlay": (0, 100, 0, 120),
+        "progress_bg": (60, 179, 113, 150),
+        "progress_fill": (34, 139, 34, 255),
+        "text": (255, 255, 255, 255)
+    },
+    "red": {
+        "bg": (178, 34, 34, 255),
+        "overlay": (139, 0, 0, 120),
+        "progress_bg": (205, 92, 92, 150),
+        "progress_fill": (220, 20, 60, 255),
+        "text": (255, 255, 255, 255)
+    },
+    "purple": {
+        "bg": (106, 90, 205, 255),
+        "overlay": (75, 0, 130, 120),
+        "progress_bg": (147, 112, 219, 150),
+        "progress_fill": (138, 43, 226, 255),
+        "text": (255, 255, 255, 255)
+    },
+    "gold": {
+        "bg": (184, 134, 11, 255),
+        "overlay": (139, 69, 19, 120),
+        "progress_bg": (218, 165, 32, 150),
+        "progress_fill": (255, 215, 0, 255),
+        "text": (255, 255, 255, 255)
+    }
+}
+
+# Solid card backgrounds with the readability overlay already composited on
+for _colors in _CARD_THEMES.values():
+    _colors["bg_final"] = Image.alpha_composite(
+        Image.new("RGBA", (1, 1), _colors["bg"]),
+        Image.new("RGBA", (1, 1), _colors["overlay"])
+    ).getpixel((0, 0))
+del _colors
+
+# Leaderboard image theme colors
+_LEADERBOARD_THEMES = {
+    "default": {
+        "bg": (47, 49, 54, 255),
+        "header_bg": (32, 34, 37, 255),
+        "entry_bg": (54, 57, 63, 255),
+        "highlight": (88, 101, 242, 255),  # Discord blurple
+        "text": (255, 255, 255, 255),
+        "subtext": (185, 187, 190, 255)
+    },
+    "dark": {
+        "bg": (30, 30, 30, 255),
+        "header_bg": (20, 20, 20, 255),
+        "entry_bg": (40, 40, 40, 255),
+        "highlight": (100, 100, 100, 255),
+        "text": (220, 220, 220, 255),
+        "subtext": (150, 150, 150, 255)
+    },
+    "light": {
+        "bg": (240, 240, 240, 255),
+        "header_bg": (230, 230, 230, 255),
+        "entry_bg": (250, 250, 250, 255),
+        "highlight": (150, 150, 150, 255),
+        "text": (30, 30, 30, 255),
+        "subtext": (100, 100, 100, 255)
+    },
+    "blue": {
+        "bg": (53, 109, 187, 255),
+        "header_bg": (41, 84, 144, 255),
+        "entry_bg": (65, 121, 199, 255),
+        "highlight": (30, 144, 255, 255),
+        "text": (255, 255, 255, 255),
+        "subtext": (220, 230, 242, 255)
+    },
+    "green": {
+        "bg": (46, 139, 87, 255),
+        "header_bg": (36, 107, 67, 255),
+        "entry_bg": (56, 157, 101, 255),
+        "highlight": (34, 139, 34, 255),
+        "text": (255, 255, 255, 255),
+        "subtext": (220, 240, 220, 255)
+    },
+    "red": {
+        "bg": (178, 34, 34, 255),
+        "header_bg": (139, 26, 26, 255),
+        "entry_bg": (205, 51, 51, 255),
+        "highlight": (220, 20, 60, 255),
+        "text": (255, 255, 255, 255),
+        "subtext": (255, 220, 220, 255)
+    },
+    "purple": {
+        "bg": (106, 90, 205, 255),
+        "header_bg": (85, 72, 164, 255),
+        "entry_bg": (122, 104, 220, 255),
+        "highlight": (138, 43, 226, 255),
+        "text": (255, 255, 255, 255),
+        "subtext": (230, 220, 250, 255)
+    },
+    "gold": {
+        "bg": (184, 134, 11, 255),
+        "header_bg": (139, 101, 8, 255),
+        "entry_bg": (205, 149, 12, 255),
+        "highlight": (255, 215, 0, 255),
+        "text": (255, 255, 255, 255),
+        "subtext": (255, 248, 220, 255)
+    }
+}
+
+# Podium row colours, derived from each leaderboard theme once
+for _colors in _LEADERBOARD_THEMES.values():
+    _colors["rank1_bg"] = tuple(int(c * 1.2) if c < 200 else c for c in _colors["highlight"])
+    _colors["rank2_bg"] = tuple(int(c * 1.1) if c < 220 else c for c in _colors["entry_bg"])
+    _colors["rank3_bg"] = tuple(int(c * 1.05) if c < 230 else c for c in _colors["entry_bg"])
+del _colors
+
+class _TemplateFields(dict):
+    """format_map mapping that leaves unknown {placeholders} untouched"""
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+@functools.lru_cache(maxsize=256)
+def _is_simple_template(template: str) -> bool:
+    """Check that every {field} in a template is a bare name, parsing each template once"""
+    try:
+        return all(
+            field is None or field.isidentifier()
+            for _, field, _, _ in string.Formatter().parse(template)
+        )
+    except ValueError:
+        return False
+
+def _render_template(template: str, **fields) -> str:
+    """Fill {user}/{level}/{server} style placeholders in one pass"""
+    # Attribute/index fields like {user.id} are never evaluated
+    if _is_simple_template(template):
+        try:
+            return template.format_map(_TemplateFields(fields))
+        except ValueError:
+            pass
+    # Stray braces or unsupported fields; substitute the known placeholders literally
+    for key, value in fields.items():
+        template = template.replace("{" + key + "}", str(value))
+    return template
+
+@functools.lru_cache(maxsize=4096)
+def _truncate_name(name: str, limit: int) -> str:
+    """Shorten a display name to at most limit characters, ending in ..."""
+    if len(name) > limit:
+        return name[:limit - 3] + "..."
+    return name
+
+@functools.lru_cache(maxsize=16)
+def _leaderboard_template(theme: str, width: int, height: int, header_height: int) -> Image.Image:
+    """Blank leaderboard canvas with the header band drawn; callers must copy() it"""
+    colors = _LEADERBOARD_THEMES[theme]
+    image = Image.new("RGBA", (width, height), colors["bg"])
+    ImageDraw.Draw(image).rectangle(((0, 0), (width, header_height)), fill=colors["header_bg"])
+    return image
+
+@functools.lru_cache(maxsize=64)
+def _rounded_sprite(width: int, height: int, radius: int, fill: tuple) -> Image.Image:
+    """Rounded rectangle on a transparent tile, for alpha-compositing the same shape repeatedly"""
+    sprite = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    ImageDraw.Draw(sprite).rounded_rectangle(((0, 0), (width - 1, height - 1)), radius=radius, fill=fill)
+    return sprite
+
+@functools.lru_cache(maxsize=256)
+def _rank_sprite(rank: int, size: int, fill: tuple, text_fill: tuple, font: ImageFont.ImageFont) -> Image.Image:
+    """Rank badge (circle with #N centred on it); composite it centred on the badge position"""
+    text = f"#{rank}"
+    left, top, right, bottom = font.getbbox(text, anchor="mm")
+    # Wide numbers overhang the circle, so size the tile to whichever is bigger
+    half = size // 2
+    cx = max(half, -left, right)
+    cy = max(half, -top, bottom)
+    # Transparent pixels carry the text colour so anti-aliased glyph edges don't fringe dark
+    sprite = Image.new("RGBA", (2 * cx + 1, 2 * cy + 1), text_fill[:3] + (0,))
+    draw = ImageDraw.Draw(sprite)
+    draw.ellipse(((cx - half, cy - half), (cx + half, cy + half)), fill=fill)
+    draw.text((cx, cy), text, fill=text_fill, font=font, anchor="mm")
+    return sprite
+
+def _circle_mask(size: int) -> Image.Image:
+    """Build a size x size mask that keeps only the inscribed circle"""
+    mask = Image.new("L", (size, size), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, size, size), fill=255)
+    return mask
+
 class Leveling(commands.GroupCog, name="level"):
     def __init__(self, bot):
         self.bot = bot
         self.xp_data = {}  # {guild_id: {user_id: {"xp": xp, "level": level}}}
         self.level_roles = {}  # {guild_id: {level: role_id}}
+        self._sorted_level_roles = {}  # {guild_id: [(level, role_id), ...]} ascending by level
+        self._role_cache = {}  # {guild_id: {role_id: Role or None}}, built lazily by _get_role_cache
+        self._announce_channel_cache = {}  # {guild.id: channel.id} last channel a level up was posted in
+        self._rank_index = {}  # {guild_id: SortedList[(xp, user_id)]}, built lazily by get_user_rank
         self.message_cooldowns = {}  # {guild_id: {user_id: last_time}}
         # Custom message templates
         self.level_messages = {}  # {guild_id: {level?: message_template}}
@@ -29,20 +270,92 @@ class Leveling(commands.GroupCog, name="level"):
         self.xp_cooldown = 60  # 1 minute cooldown between XP awards
         self.min_xp = 10  # Minimum XP awarded per message
         self.max_xp = 20  # Maximum XP awarded per message
-        self.data_file = 'leveling.json'
+        # XP needed for each level, and running totals of it, precomputed for get_xp_for_level
+        self._xp_table = [5 * l * l + 50 * l + 100 for l in range(2048)]
+        self._cum_xp = list(itertools.accumulate(self._xp_table))
+        self.data_dir = 'xp_data'  # One {guild_id}.json file per guild
+        self.data_file = 'leveling.json'  # Legacy single-file XP store, migrated into data_dir
+        self.log_file = 'xp_data.log'  # Append-only JSONL of XP updates since the last save_data
         self.roles_file = 'level_roles.json'
         self.messages_file = 'level_messages.json'
         self.backgrounds_file = 'level_backgrounds.json'
+        # XP changes from on_message are flushed by save_task rather than per message
+        self._dirty_guilds = set()
+        # Guilds from the legacy data_file that have no shard yet; the file is kept until this empties
+        self._legacy_guilds = set()
+        self._legacy_file_pending = False
+        self._pending_updates = 0
+        self.max_pending_updates = 500  # Force a save once this many XP updates are unsaved
         self.fonts_dir = 'fonts'
         self.images_dir = 'level_images'
+        self.avatar_cache_dir = os.path.join('cache', 'avatars')  # {avatar_key}.png, survives restarts
+        # Pruned on cog_load: files unused for this long, then the oldest beyond the count cap
+        self.avatar_cache_max_age = 14 * 24 * 3600
+        self.avatar_cache_max_files = 5000
         
         # Create directories if they don't exist
         os.makedirs(self.fonts_dir, exist_ok=True)
         os.makedirs(self.images_dir, exist_ok=True)
+        os.makedirs(self.avatar_cache_dir, exist_ok=True)
+        os.makedirs(self.data_dir, exist_ok=True)
+        
+        # Rendered level card PNGs, keyed by everything drawn on the card
+        self._card_cache = TTLCache(maxsize=512, ttl=300)
+        # Downloaded avatar/background bytes keyed by avatar hash or URL, bounded to 64 MB
+        self._img_cache = LRUCache(maxsize=64 * 1024 * 1024, getsizeof=len)
+        # User IDs confirmed present by a recent diagnose, per guild
+        self._member_presence_cache = TTLCache(maxsize=256, ttl=60)
+        
+        # Debounced writers for level_roles.json and level_backgrounds.json (see _json_flusher)
+        self._roles_dirty = asyncio.Event()
+        self._bg_dirty = asyncio.Event()
+        self._flush_tasks = []
+        
+        # Worker threads for Pillow rendering (created in cog_load)
+        self._img_pool = None
+        # Circular avatar masks, by size: 150px on level cards, 80px on leaderboards
+        self._avatar_masks = {size: _circle_mask(size) for size in (150, 80)}
+        # Masked avatars ready to paste, keyed by (avatar hash, size); shared with the render threads
+        self._avatar_tiles = LRUCache(maxsize=512)
+        self._avatar_tiles_lock = threading.Lock()
+        
+        # Handle to log_file, opened in cog_load once the log has been replayed
+        self._xp_log = None
+        # Log lines appended while _compact_xp_log has the file in a worker thread
+        self._xp_log_backlog = None
+        # save_data captures a log offset before awaiting its writes, so runs must not overlap
+        self._save_lock = asyncio.Lock()
+        
+        # Shared HTTP session for image and font downloads (created in cog_load)
+        self._http = None
+        # Caps concurrent avatar downloads against the Discord CDN
+        self._avatar_fetch_limit = asyncio.Semaphore(16)
+        
+        # Card fonts by point size, loaded once by _ensure_font
+        self.font_path = os.path.join(self.fonts_dir, "Roboto-Regular.ttf")
+        self._fonts = self._load_fonts()
+        self._fonts_truetype = False
         
-        self.load_data()
         self.save_task.start()
         super().__init__()
+
+    async def cog_load(self):
+        # Listeners and commands are only registered after cog_load returns
+        await asyncio.to_thread(self.load_data)
+        await asyncio.to_thread(self._prune_avatar_cache)
+        self._xp_log = open(self.log_file, 'ab')
+        self._flush_tasks = [
+            asyncio.create_task(self._json_flusher(self._roles_dirty, self.roles_file, lambda: self.level_roles)),
+            asyncio.create_task(self._json_flusher(self._bg_dirty, self.backgrounds_file, lambda: self.background_images)),
+        ]
+        self._img_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(4, os.cpu_count() or 2),
+            thread_name_prefix="cardgen"
+        )
+        self._http = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=32, keepalive_timeout=75)
+        )
+        await self._ensure_font()
         
     # Basic level commands group
     level_group = app_commands.Group(name="level", description="Basic level commands")
@@ -63,7 +376,7 @@ class Leveling(commands.GroupCog, name="level"):
         current_level = data["level"]
         current_xp = data["xp"]
         next_level_xp = self.get_xp_for_level(current_level)
-        progress = current_xp - sum(self.get_xp_for_level(l) for l in range(current_level))
+        progress = current_xp - self.get_total_xp_for_level(current_level)
         
         embed = discord.Embed(
             title=f"{member.name}'s Level",
@@ -143,10 +456,13 @@ class Leveling(commands.GroupCog, name="level"):
         if guild_id not in self.xp_data:
             self.xp_data[guild_id] = {}
             
+        old_xp = self.xp_data[guild_id].get(user_id, {}).get("xp", 0)
         self.xp_data[guild_id][user_id] = {
             "xp": xp,
             "level": self.get_level_from_xp(xp)
         }
+        self._update_rank_index(guild_id, user_id, old_xp, xp)
+        self._mark_dirty(guild_id)
         await self.save_data()
         
         await interaction.response.send_message(f"Set {member.mention}'s XP to {xp} (Level {self.xp_data[guild_id][user_id]['level']}).")
@@ -172,7 +488,9 @@ class Leveling(commands.GroupCog, name="level"):
         
         self.xp_data[guild_id][user_id]["xp"] = new_xp
         self.xp_data[guild_id][user_id]["level"] = new_level
+        self._update_rank_index(guild_id, user_id, current_xp, new_xp)
         
+        self._mark_dirty(guild_id)
         await self.save_data()
         
         await interaction.response.send_message(f"Added {xp} XP to {member.mention}. They are now level {new_level}.")
@@ -194,6 +512,7 @@ class Leveling(commands.GroupCog, name="level"):
             self.level_roles[guild_id] = {}
             
         self.level_roles[guild_id][str(level)] = str(role.id)
+        self._rebuild_sorted_level_roles(guild_id)
         await self.save_data()
         
         await interaction.response.send_message(f"Role {role.mention} will be assigned at level {level}.")
@@ -206,6 +525,7 @@ class Leveling(commands.GroupCog, name="level"):
         guild_id = str(interaction.guild.id)
         if guild_id in self.level_roles and str(level) in self.level_roles[guild_id]:
             del self.level_roles[guild_id][str(level)]
+            self._rebuild_sorted_level_roles(guild_id)
             await self.save_data()
             await interaction.response.send_message(f"Removed role assignment for level {level}.")
         else:
@@ -256,9 +576,12 @@ class Leveling(commands.GroupCog, name="level"):
         await self.save_level_messages()
         
         # Confirmation and preview
-        preview = message.replace("{user}", interaction.user.mention)
-        preview = preview.replace("{level}", str(level if level > 0 else "X"))
-        preview = preview.replace("{server}", interaction.guild.name)
+        preview = _render_template(
+            message,
+            user=interaction.user.mention,
+            level=level if level > 0 else "X",
+            server=interaction.guild.name
+        )
         
         embed = discord.Embed(
             title="Level-up Message Set",
@@ -377,7 +700,7 @@ class Leveling(commands.GroupCog, name="level"):
                 f"An error occurred while toggling the leveling system: {str(e)}",
                 ephemeral=True
             )
-            print(f"Error in toggle_leveling command: {e}")
+            logger.error(f"Error in toggle_leveling command: {e}")
             
     @settings_group.command(name="togglemessages", description="Enable or disable level up announcements")
     @app_commands.describe(enabled="Whether to enable or disable level up messages")
@@ -414,7 +737,7 @@ class Leveling(commands.GroupCog, name="level"):
                 f"An error occurred while toggling level up messages: {str(e)}",
                 ephemeral=True
             )
-            print(f"Error in toggle_level_up_messages command: {e}")
+            logger.error(f"Error in toggle_level_up_messages command: {e}")
     
     # Card commands group
     card_group = app_commands.Group(name="card", description="Level card commands")
@@ -441,7 +764,8 @@ class Leveling(commands.GroupCog, name="level"):
         user_id = str(member.id)
         
         # Check if the user has XP data
-        if guild_id not in self.xp_data or user_id not in self.xp_data[guild_id]:
+        data = self.xp_data.get(guild_id, {}).get(user_id)
+        if data is None:
             await interaction.response.send_message(f"{member.mention} hasn't earned any XP yet!", ephemeral=True)
             return
         
@@ -449,14 +773,13 @@ class Leveling(commands.GroupCog, name="level"):
         await interaction.response.defer()
         
         # Get user data
-        data = self.xp_data[guild_id][user_id]
         current_level = data["level"]
         current_xp = data["xp"]
         
         # Calculate XP for next level
-        total_xp_next = sum(self.get_xp_for_level(l) for l in range(current_level + 1))
+        total_xp_next = self.get_total_xp_for_level(current_level + 1)
         # Calculate XP for current level
-        total_xp_current = sum(self.get_xp_for_level(l) for l in range(current_level))
+        total_xp_current = self.get_total_xp_for_level(current_level)
         # Progress to next level
         level_xp = self.get_xp_for_level(current_level)
         progress = current_xp - total_xp_current
@@ -466,18 +789,30 @@ class Leveling(commands.GroupCog, name="level"):
             # Get server rank
             rank = await self.get_user_rank(guild_id, user_id)
             
-            # Generate level card image
-            card_bytes = await self.generate_level_card(
-                member=member,
-                guild_id=guild_id,
-                user_id=user_id,
-                level=current_level,
-                xp=current_xp,
-                next_level_xp=total_xp_next,
-                percentage=percentage,
-                rank=rank,
-                theme=theme
+            # Reuse a recently rendered card if nothing on it has changed
+            cache_key = (
+                guild_id, user_id, current_level, current_xp, percentage, rank, theme,
+                self.background_images.get(guild_id, {}).get(user_id),
+                member.display_name, member.display_avatar.key
             )
+            cached = self._card_cache.get(cache_key)
+            if cached is not None:
+                card_bytes = io.BytesIO(cached)
+            else:
+                # Generate level card image
+                card_bytes = await self.generate_level_card(
+                    member=member,
+                    guild_id=guild_id,
+                    user_id=user_id,
+                    level=current_level,
+                    xp=current_xp,
+                    next_level_xp=total_xp_next,
+                    percentage=percentage,
+                    rank=rank,
+                    theme=theme
+                )
+                self._card_cache[cache_key] = card_bytes.getvalue()
+                card_bytes.seek(0)
             
             # Send the card
             file = discord.File(fp=card_bytes, filename="level_card.png")
@@ -510,20 +845,16 @@ class Leveling(commands.GroupCog, name="level"):
         guild_id = str(interaction.guild.id)
         user_id = str(target_member.id)
         
-        # Initialize background images dict if needed
-        if guild_id not in self.background_images:
-            self.background_images[guild_id] = {}
-        
         # Resetting background
         if not image_url:
-            if user_id in self.background_images[guild_id]:
-                del self.background_images[guild_id][user_id]
-                
+            users = self.background_images.get(guild_id)
+            if users and users.pop(user_id, None) is not None:
                 # Clean up if guild dict is empty
-                if not self.background_images[guild_id]:
-                    del self.background_images[guild_id]
+                if not users:
+                    self.background_images.pop(guild_id, None)
                 
-                await self.save_backgrounds()
+                self._invalidate_card_cache(guild_id, user_id)
+                self._bg_dirty.set()
                 await interaction.response.send_message(f"Reset background for {target_member.mention}'s level card.", ephemeral=True)
             else:
                 await interaction.response.send_message(f"{target_member.mention} doesn't have a custom background.", ephemeral=True)
@@ -540,59 +871,63 @@ class Leveling(commands.GroupCog, name="level"):
             # Try to download the image to validate it
             await interaction.response.defer(ephemeral=True)
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(image_url) as resp:
-                    if resp.status != 200:
-                        await interaction.followup.send("Failed to download the image. Make sure the URL is accessible.", ephemeral=True)
-                        return
+            # Only the file signature is needed to validate the image
+            async with self._http.get(image_url) as resp:
+                if resp.status != 200:
+                    await interaction.followup.send("Failed to download the image. Make sure the URL is accessible.", ephemeral=True)
+                    return
+                
+                try:
+                    header = await resp.content.readexactly(12)
+                except asyncio.IncompleteReadError:
+                    header = b""
+            
+            if not _sniff_image_format(header):
+                await interaction.followup.send("Invalid image format. Please provide a valid image (PNG, JPG, WEBP or GIF).", ephemeral=True)
+                return
+            
+            # Save the URL
+            self.background_images.setdefault(guild_id, {})[user_id] = image_url
+            self._invalidate_card_cache(guild_id, user_id)
+            self._bg_dirty.set()
+            
+            try:
+                # Generate a preview
+                data = self.xp_data.get(guild_id, {}).get(user_id)
+                if data is not None:
+                    level = data["level"]
+                    xp = data["xp"]
                     
-                    image_data = await resp.read()
+                    # Calculate progress for preview
+                    total_xp_next = self.get_total_xp_for_level(level + 1)
+                    total_xp_current = self.get_total_xp_for_level(level)
+                    level_xp = self.get_xp_for_level(level)
+                    progress = xp - total_xp_current
+                    percentage = min(100, int((progress / level_xp) * 100))
                     
-                    # Check if it's a valid image
-                    try:
-                        img = Image.open(io.BytesIO(image_data))
-                        img.verify()  # Verify it's a valid image
-                        
-                        # Save the URL
-                        self.background_images[guild_id][user_id] = image_url
-                        await self.save_backgrounds()
-                        
-                        # Generate a preview
-                        if guild_id in self.xp_data and user_id in self.xp_data[guild_id]:
-                            data = self.xp_data[guild_id][user_id]
-                            level = data["level"]
-                            xp = data["xp"]
-                            
-                            # Calculate progress for preview
-                            total_xp_next = sum(self.get_xp_for_level(l) for l in range(level + 1))
-                            total_xp_current = sum(self.get_xp_for_level(l) for l in range(level))
-                            level_xp = self.get_xp_for_level(level)
-                            progress = xp - total_xp_current
-                            percentage = min(100, int((progress / level_xp) * 100))
-                            
-                            # Generate preview
-                            card_bytes = await self.generate_level_card(
-                                member=target_member,
-                                guild_id=guild_id,
-                                user_id=user_id,
-                                level=level,
-                                xp=xp,
-                                next_level_xp=total_xp_next,
-                                percentage=percentage
-                            )
-                            
-                            # Send preview
-                            file = discord.File(fp=card_bytes, filename="level_card_preview.png")
-                            await interaction.followup.send(
-                                content=f"Background set for {target_member.mention}'s level card. Preview:",
-                                file=file,
-                                ephemeral=True
-                            )
-                        else:
-                            await interaction.followup.send(f"Background set for {target_member.mention}'s level card. They need to earn some XP to see it in action!", ephemeral=True)
-                    except Exception as e:
-                        logger.error(f"Invalid image format: {e}")
-                        await interaction.followup.send("Invalid image format. Please provide a valid image (PNG, JPG, etc).", ephemeral=True)
+                    # Generate preview
+                    card_bytes = await self.generate_level_card(
+                        member=target_member,
+                        guild_id=guild_id,
+                        user_id=user_id,
+                        level=level,
+                        xp=xp,
+                        next_level_xp=total_xp_next,
+                        percentage=percentage
+                    )
+                    
+                    # Send preview
+                    file = discord.File(fp=card_bytes, filename="level_card_preview.png")
+                    await interaction.followup.send(
+                        content=f"Background set for {target_member.mention}'s level card. Preview:",
+                        file=file,
+                        ephemeral=True
+                    )
+                else:
+                    await interaction.followup.send(f"Background set for {target_member.mention}'s level card. They need to earn some XP to see it in action!", ephemeral=True)
+            except Exception as e:
+                logger.error(f"Error generating background preview: {e}")
+                await interaction.followup.send(f"Background set for {target_member.mention}'s level card, but the preview could not be generated.", ephemeral=True)
         except Exception as e:
             logger.error(f"Error setting background: {e}")
             await interaction.followup.send(f"Error setting background: {e}", ephemeral=True)
@@ -606,7 +941,8 @@ class Leveling(commands.GroupCog, name="level"):
         if guild_id in self.background_images:
             backgrounds_count = len(self.background_images[guild_id])
             del self.background_images[guild_id]
-            await self.save_backgrounds()
+            self._invalidate_card_cache(guild_id)
+            self._bg_dirty.set()
             await interaction.response.send_message(f"Reset {backgrounds_count} custom backgrounds for this server.", ephemeral=True)
         else:
             await interaction.response.send_message("No custom backgrounds were set for this server.", ephemeral=True)
@@ -637,16 +973,9 @@ class Leveling(commands.GroupCog, name="level"):
             await interaction.response.send_message("No XP data available for this server yet!", ephemeral=True)
             return
             
-        # Sort users by XP
-        sorted_users = sorted(
-            self.xp_data[guild_id].items(),
-            key=lambda x: x[1]["xp"],
-            reverse=True
-        )
-        
         # Paginate results (5 per page for image)
         per_page = 5
-        total_pages = (len(sorted_users) + per_page - 1) // per_page
+        total_pages = (len(self.xp_data[guild_id]) + per_page - 1) // per_page
         
         if page < 1 or page > total_pages:
             await interaction.response.send_message(f"Invalid page number. Please specify a page between 1 and {total_pages}.", ephemeral=True)
@@ -655,11 +984,19 @@ class Leveling(commands.GroupCog, name="level"):
         # Defer response since image generation might take some time
         await interaction.response.defer()
         
+        # Only the top page * per_page users need ordering
+        top_users = heapq.nlargest(
+            page * per_page,
+            self.xp_data[guild_id].items(),
+            key=lambda x: x[1]["xp"]
+        )
+        page_users = top_users[(page - 1) * per_page:]
+        
         try:
             # Generate the leaderboard image
             leaderboard_bytes = await self.generate_leaderboard_image(
                 guild=interaction.guild,
-                sorted_users=sorted_users,
+                page_users=page_users,
                 page=page,
                 total_pages=total_pages,
                 per_page=per_page,
@@ -689,32 +1026,36 @@ class Leveling(commands.GroupCog, name="level"):
             "Roboto-Italic.ttf": "https://github.com/google/fonts/raw/main/apache/roboto/static/Roboto-Italic.ttf"
         }
         
-        success = 0
-        failed = 0
-        skipped = 0
-        
-        for font_file, font_url in fonts.items():
+        async def _download_font(session, font_file, font_url):
             font_path = os.path.join(self.fonts_dir, font_file)
             
             # Skip if already exists
             if os.path.exists(font_path):
-                skipped += 1
-                continue
+                return "skipped"
                 
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(font_url) as resp:
-                        if resp.status == 200:
-                            font_data = await resp.read()
-                            with open(font_path, 'wb') as f:
-                                f.write(font_data)
-                            success += 1
-                        else:
-                            logger.error(f"Failed to download font {font_file}: HTTP {resp.status}")
-                            failed += 1
+                async with session.get(font_url) as resp:
+                    if resp.status != 200:
+                        logger.error(f"Failed to download font {font_file}: HTTP {resp.status}")
+                        return "failed"
+                    font_data = await resp.read()
+                await asyncio.to_thread(write_file_atomic, font_path, font_data)
+                return "success"
             except Exception as e:
                 logger.error(f"Error downloading font {font_file}: {e}")
-                failed += 1
+                return "failed"
+        
+        # Download all fonts concurrently over the shared session
+        results = await asyncio.gather(
+            *(_download_font(self._http, font_file, font_url) for font_file, font_url in fonts.items())
+        )
+        
+        # Pick up a newly downloaded card font
+        await self._ensure_font()
+        
+        success = results.count("success")
+        failed = results.count("failed")
+        skipped = results.count("skipped")
         
         # Generate report
         report = [
@@ -759,7 +1100,8 @@ class Leveling(commands.GroupCog, name="level"):
         if guild_id in self.background_images:
             backgrounds_count = len(self.background_images[guild_id])
             del self.background_images[guild_id]
-            await self.save_backgrounds()
+            self._invalidate_card_cache(guild_id)
+            self._bg_dirty.set()
             
             await interaction.followup.send(f"Reset {backgrounds_count} custom backgrounds for this server.", ephemeral=True)
         else:
@@ -803,22 +1145,40 @@ class Leveling(commands.GroupCog, name="level"):
                 for level in invalid_level_roles:
                     del self.level_roles[guild_id][level]
                     issues_fixed += 1
+                self._rebuild_sorted_level_roles(guild_id)
                 
                 report.append(f"✅ Removed {len(invalid_level_roles)} invalid level roles that no longer exist")
             
-            # Check user entries
-            invalid_users = []
-            for user_id in list(self.xp_data[guild_id].keys()):
+            # Check user entries - only users missing from the member cache
+            # (and not confirmed present by a recent diagnose) need a lookup
+            cached_ids = {str(m.id) for m in interaction.guild.members}
+            recently_present = self._member_presence_cache.get(guild_id, set())
+            suspects = [
+                user_id for user_id in self.xp_data[guild_id]
+                if user_id not in cached_ids and user_id not in recently_present
+            ]
+            
+            present = set()
+            unchecked = set()  # Batches whose lookup failed: kept, but not cached as present
+            for i in range(0, len(suspects), 100):
+                batch = suspects[i:i + 100]
                 try:
-                    member = await interaction.guild.fetch_member(int(user_id))
-                    if not member:
-                        invalid_users.append(user_id)
-                        issues_found += 1
-                except discord.NotFound:
-                    invalid_users.append(user_id)
-                    issues_found += 1
+                    members = await interaction.guild.query_members(
+                        user_ids=[int(user_id) for user_id in batch],
+                        limit=len(batch)
+                    )
+                    present.update(str(m.id) for m in members)
                 except Exception as e:
-                    report.append(f"⚠️ Error checking user {user_id}: {e}")
+                    # Never delete users we couldn't check
+                    unchecked.update(batch)
+                    report.append(f"⚠️ Error checking {len(batch)} users: {e}")
+            self._member_presence_cache[guild_id] = recently_present | present
+            
+            invalid_users = [
+                user_id for user_id in suspects
+                if user_id not in present and user_id not in unchecked
+            ]
+            issues_found += len(invalid_users)
             
             if invalid_users:
                 for user_id in invalid_users:
@@ -854,6 +1214,8 @@ class Leveling(commands.GroupCog, name="level"):
                 report.append(f"✅ Fixed {fixed_user_entries} user entries with missing fields")
             
             # Save changes
+            self._rank_index.pop(guild_id, None)
+            self._mark_dirty(guild_id)
             await self.save_data()
             await self.save_level_roles()
             
@@ -890,11 +1252,11 @@ class Leveling(commands.GroupCog, name="level"):
             }
             
             # Convert to JSON
-            export_json = json.dumps(export_data, indent=2)
+            export_json = json_dumps(export_data)
             
             # Create file
             file = discord.File(
-                io.BytesIO(export_json.encode('utf-8')),
+                io.BytesIO(export_json),
                 filename=f"leveling_backup_{timestamp}.json"
             )
             
@@ -907,54 +1269,103 @@ class Leveling(commands.GroupCog, name="level"):
         except Exception as e:
             await interaction.followup.send(f"Error creating backup: {e}", ephemeral=True)
 
+    def _invalidate_card_cache(self, guild_id: str, user_id: Optional[str] = None):
+        """Drop cached level cards for a user, or for the whole guild"""
+        for key in list(self._card_cache.keys()):
+            if key[0] == guild_id and (user_id is None or key[1] == user_id):
+                self._card_cache.pop(key, None)
+
+    def _rebuild_sorted_level_roles(self, guild_id: str):
+        """Refresh the level-ordered role thresholds used by check_level_roles"""
+        roles = self.level_roles.get(guild_id)
+        if roles:
+            self._sorted_level_roles[guild_id] = sorted(
+                (int(level), int(role_id)) for level, role_id in roles.items()
+            )
+        else:
+            self._sorted_level_roles.pop(guild_id, None)
+        self._role_cache.pop(guild_id, None)
+
+    def _refresh_role_cache(self, guild: discord.Guild) -> dict:
+        """Resolve this guild's level reward roles once and cache them"""
+        guild_id = str(guild.id)
+        role_cache = {
+            role_id: guild.get_role(role_id)
+            for _, role_id in self._sorted_level_roles.get(guild_id, [])
+        }
+        self._role_cache[guild_id] = role_cache
+        return role_cache
+
+    def _get_role_cache(self, guild: discord.Guild) -> dict:
+        """Return this guild's resolved level reward roles, building them if needed"""
+        role_cache = self._role_cache.get(str(guild.id))
+        if role_cache is None:
+            role_cache = self._refresh_role_cache(guild)
+        return role_cache
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        self._role_cache.pop(str(role.guild.id), None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        self._role_cache.pop(str(after.guild.id), None)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        if self._announce_channel_cache.get(channel.guild.id) == channel.id:
+            del self._announce_channel_cache[channel.guild.id]
+
+    def _announce_channels(self, guild: discord.Guild):
+        """Yield channels the bot can post in, starting with the last one that worked"""
+        me = guild.me
+        cached = guild.get_channel(self._announce_channel_cache.get(guild.id, 0))
+        if cached and cached.permissions_for(me).send_messages:
+            yield cached
+        for channel in guild.text_channels:
+            if channel != cached and channel.permissions_for(me).send_messages:
+                yield channel
+
     async def check_level_roles(self, member, level):
         """Check if the member should receive a role reward for their current level."""
         guild_id = str(member.guild.id)
         
         # Return if this guild has no level roles set up
-        if guild_id not in self.level_roles:
+        sorted_roles = self._sorted_level_roles.get(guild_id)
+        if not sorted_roles:
             return
             
         try:
-            # Sort the level roles by level requirement (ascending)
-            sorted_roles = sorted(
-                self.level_roles[guild_id].items(),
-                key=lambda x: int(x[1]["level"])
-            )
-            
             # Find all roles the member should have based on their level
-            roles_to_add = []
-            for role_id, data in sorted_roles:
-                if level >= int(data["level"]):
-                    roles_to_add.append(role_id)
-                else:
-                    break  # No need to check higher levels
+            cutoff = bisect.bisect_right(sorted_roles, (level, 1 << 63))
+            roles_to_add = [role_id for _, role_id in sorted_roles[:cutoff]]
+            
+            role_cache = self._get_role_cache(member.guild)
             
-            # Get the actual role objects
-            valid_roles = []
+            # Only resolve roles the member doesn't already have
+            member_role_ids = {r.id for r in member.roles}
+            missing_roles = []
             for role_id in roles_to_add:
-                try:
-                    role = member.guild.get_role(int(role_id))
-                    if role:
-                        valid_roles.append(role)
-                    else:
-                        print(f"Role {role_id} not found in guild {guild_id}")
-                except Exception as e:
-                    print(f"Error getting role {role_id}: {e}")
+                if role_id in member_role_ids:
+                    continue
+                role = role_cache.get(role_id)
+                if role:
+                    missing_roles.append(role)
+                else:
+                    logger.warning(f"Role {role_id} not found in guild {guild_id}")
             
             # Add missing roles
             try:
-                missing_roles = [role for role in valid_roles if role not in member.roles]
                 if missing_roles:
                     await member.add_roles(*missing_roles, reason="Level up role reward")
-                    print(f"Added {len(missing_roles)} level roles to {member.name}")
+                    logger.debug(f"Added {len(missing_roles)} level roles to {member.name}")
             except discord.Forbidden:
-                print(f"Missing permissions to add roles to {member.name} in {member.guild.name}")
+                logger.warning(f"Missing permissions to add roles to {member.name} in {member.guild.name}")
             except Exception as e:
-                print(f"Error adding roles to {member.name}: {e}")
+                logger.error(f"Error adding roles to {member.name}: {e}")
                 
         except Exception as e:
-            print(f"Error checking level roles for {member.name}: {e}")
+            logger.error(f"Error checking level roles for {member.name}: {e}")
 
     @app_commands.command(name="addlevelrole", description="Add a role reward for reaching a specific level")
     @app_commands.describe(level="The level at which to award the role", role="The role to award at the specified level")
@@ -972,10 +1383,10 @@ class Leveling(commands.GroupCog, name="level"):
             
         # Store the role ID for the specified level
         self.level_roles[guild_id][str(level)] = role.id
+        self._rebuild_sorted_level_roles(guild_id)
         
-        # Save updated role rewards
-        with open("level_roles.json", "w") as f:
-            json.dump(self.level_roles, f, indent=4)
+        # Save updated role rewards (written by the background flusher)
+        self._roles_dirty.set()
             
         await interaction.response.send_message(f"✅ {role.mention} will now be awarded at level {level}")
 
@@ -1016,6 +1427,7 @@ class Leveling(commands.GroupCog, name="level"):
             # If the guild has no level roles left, remove the guild entry
             if not self.level_roles[guild_id]:
                 del self.level_roles[guild_id]
+            self._rebuild_sorted_level_roles(guild_id)
                 
             # Save the updated data
             self.save_level_roles()
@@ -1035,7 +1447,7 @@ class Leveling(commands.GroupCog, name="level"):
                 f"An error occurred while removing the level role: {str(e)}",
                 ephemeral=True
             )
-            print(f"Error in remove_level_role command: {e}")
+            logger.error(f"Error in remove_level_role command: {e}")
 
     @app_commands.command(name="list_level_roles", description="List all role rewards in the level system")
     async def list_level_roles(self, interaction: discord.Interaction):
@@ -1057,23 +1469,16 @@ class Leveling(commands.GroupCog, name="level"):
                 color=discord.Color.blue()
             )
             
-            # Sort levels numerically for better display
-            sorted_levels = sorted(self.level_roles[guild_id].keys(), key=int)
-            
-            for level in sorted_levels:
-                role_id = self.level_roles[guild_id][level]
-                role = interaction.guild.get_role(int(role_id))
-                role_mention = role.mention if role else f"Unknown Role (ID: {role_id})"
-            # Sort by level
-            sorted_levels = sorted(self.level_roles[guild_id].items(), key=lambda x: int(x[0]))
+            # Already sorted by level
+            role_cache = self._get_role_cache(interaction.guild)
             
             role_text = ""
-            for level_str, role_id in sorted_levels:
-                role = interaction.guild.get_role(role_id)
+            for level, role_id in self._sorted_level_roles.get(guild_id, []):
+                role = role_cache.get(role_id)
                 if role:
-                    role_text += f"Level {level_str}: {role.mention}\n"
+                    role_text += f"Level {level}: {role.mention}\n"
                 else:
-                    role_text += f"Level {level_str}: Unknown Role (ID: {role_id})\n"
+                    role_text += f"Level {level}: Unknown Role (ID: {role_id})\n"
                     
             embed.add_field(name="Rewards", value=role_text, inline=False)
             
@@ -1083,7 +1488,7 @@ class Leveling(commands.GroupCog, name="level"):
                 f"An error occurred while retrieving level roles: {str(e)}",
                 ephemeral=True
             )
-            print(f"Error in view_level_roles command: {e}")
+            logger.error(f"Error in view_level_roles command: {e}")
 
     @app_commands.command(name="setlevel", description="Set a user's level")
     @app_commands.describe(member="The member to set the level for", level="The level to set for the member")
@@ -1097,21 +1502,23 @@ class Leveling(commands.GroupCog, name="level"):
         guild_id = str(interaction.guild.id)
         user_id = str(member.id)
         
-        if guild_id not in self.levels:
-            self.levels[guild_id] = {}
+        if guild_id not in self.xp_data:
+            self.xp_data[guild_id] = {}
             
         xp_required = self.calculate_xp_for_level(level)
         
         # Update user's level data
-        self.levels[guild_id][user_id] = {
+        old_xp = self.xp_data[guild_id].get(user_id, {}).get("xp", 0)
+        self.xp_data[guild_id][user_id] = {
             "xp": xp_required,
             "level": level,
             "last_message": int(time.time())
         }
+        self._update_rank_index(guild_id, user_id, old_xp, xp_required)
         
         # Save updated levels data
-        with open("leveling.json", "w") as f:
-            json.dump(self.levels, f, indent=4)
+        self._mark_dirty(guild_id)
+        await self.save_data()
             
         await interaction.response.send_message(f"{member.mention}'s level has been set to {level}")
         
@@ -1121,71 +1528,219 @@ class Leveling(commands.GroupCog, name="level"):
     def load_data(self):
         """Load all data from files"""
         try:
+            shards = [name for name in os.listdir(self.data_dir) if name.endswith('.json')]
+            for name in shards:
+                with open(os.path.join(self.data_dir, name), 'rb') as f:
+                    self.xp_data[name[:-len('.json')]] = json_loads(f.read())
             if os.path.exists(self.data_file):
-                with open(self.data_file, 'r') as f:
-                    self.xp_data = json.load(f)
+                # A split that stopped partway leaves both; shards are newer for the guilds they cover
+                with open(self.data_file, 'rb') as f:
+                    legacy = json_loads(f.read())
+                self._legacy_guilds = set(legacy) - set(self.xp_data)
+                for guild_id in self._legacy_guilds:
+                    self.xp_data[guild_id] = legacy[guild_id]
+                # Split the rest into per-guild shards on the next save
+                self._dirty_guilds.update(self._legacy_guilds)
+                self._legacy_file_pending = True
         except Exception as e:
             logger.error(f"Error loading XP data: {e}")
+        
+        self._replay_xp_log()
             
         try:
             if os.path.exists(self.roles_file):
-                with open(self.roles_file, 'r') as f:
-                    self.level_roles = json.load(f)
+                with open(self.roles_file, 'rb') as f:
+                    self.level_roles = json_loads(f.read())
+            for guild_id in self.level_roles:
+                self._rebuild_sorted_level_roles(guild_id)
         except Exception as e:
             logger.error(f"Error loading level roles: {e}")
             
         try:
             if os.path.exists(self.messages_file):
-                with open(self.messages_file, 'r') as f:
-                    self.level_messages = json.load(f)
+                with open(self.messages_file, 'rb') as f:
+                    self.level_messages = json_loads(f.read())
         except Exception as e:
             logger.error(f"Error loading level messages: {e}")
             
         try:
             if os.path.exists(self.backgrounds_file):
-                with open(self.backgrounds_file, 'r') as f:
-                    self.background_images = json.load(f)
+                with open(self.backgrounds_file, 'rb') as f:
+                    self.background_images = json_loads(f.read())
         except Exception as e:
             logger.error(f"Error loading background images: {e}")
             
-    async def save_data(self):
-        """Save XP and level role data to files"""
+    def _replay_xp_log(self):
+        """Apply XP updates logged after the last snapshot was written"""
+        if not os.path.exists(self.log_file):
+            return
+        replayed = 0
         try:
-            with open(self.data_file, 'w') as f:
-                json.dump(self.xp_data, f)
-            with open(self.roles_file, 'w') as f:
-                json.dump(self.level_roles, f)
-            await self.save_level_messages()
-            await self.save_backgrounds()
+            with open(self.log_file, 'rb') as f:
+                for line in f:
+                    try:
+                        entry = json_loads(line)
+                    except ValueError:
+                        # A crash mid-append can leave a torn final line
+                        continue
+                    user_data = self.xp_data.setdefault(entry["g"], {}).setdefault(entry["u"], {})
+                    user_data.update(xp=entry["x"], level=entry["l"], last_message=entry["t"])
+                    self._dirty_guilds.add(entry["g"])
+                    replayed += 1
         except Exception as e:
-            logger.error(f"Error saving data: {e}")
+            logger.error(f"Error replaying XP log: {e}")
+        if replayed:
+            logger.info(f"Replayed {replayed} XP updates from {self.log_file}")
+            
+    def _append_xp_log(self, guild_id: str, user_id: str, user_data: dict):
+        """Record one XP update so it survives a crash before the next save_data"""
+        if self._xp_log is None and self._xp_log_backlog is None:
+            return
+        entry = {
+            "g": guild_id,
+            "u": user_id,
+            "x": user_data["xp"],
+            "l": user_data["level"],
+            "t": user_data.get("last_message", 0)
+        }
+        line = json_dumps(entry) + b"\n"
+        if self._xp_log_backlog is not None:
+            self._xp_log_backlog.append(line)
+            return
+        self._xp_log.write(line)
+        self._xp_log.flush()
+        
+    async def _compact_xp_log(self, offset: int):
+        """Drop log entries before offset, which are now covered by the snapshot files"""
+        if self._xp_log is None:
+            return
+        self._xp_log.flush()
+        old_log, self._xp_log = self._xp_log, None
+        self._xp_log_backlog = []
+        try:
+            self._xp_log = await asyncio.to_thread(self._rewrite_xp_log, old_log, offset)
+        except Exception:
+            old_log.close()
+            self._xp_log = await asyncio.to_thread(open, self.log_file, 'ab')
+            raise
+        finally:
+            # Anything logged while the file was being rewritten goes after the kept tail
+            backlog, self._xp_log_backlog = self._xp_log_backlog, None
+            if self._xp_log is not None and backlog:
+                self._xp_log.write(b"".join(backlog))
+                self._xp_log.flush()
+    
+    def _rewrite_xp_log(self, old_log, offset: int):
+        """Rewrite log_file without its first offset bytes and return a new append handle (worker thread)"""
+        old_log.close()
+        # Keep anything appended while the snapshot was being written
+        with open(self.log_file, 'rb') as f:
+            f.seek(offset)
+            tail = f.read()
+        write_file_atomic(self.log_file, tail)
+        return open(self.log_file, 'ab')
+            
+    def _mark_dirty(self, guild_id: str):
+        """Flag a guild's XP data for the next save_data"""
+        self._dirty_guilds.add(guild_id)
+        self._pending_updates += 1
+
+    async def save_data(self):
+        """Save XP data for changed guilds and level role data to files"""
+        async with self._save_lock:
+            dirty_guilds, self._dirty_guilds = self._dirty_guilds, set()
+            self._pending_updates = 0
+            # Every log entry before this point is already applied to xp_data
+            log_offset = self._xp_log.tell() if self._xp_log else 0
+            try:
+                # Only rewrite the files of guilds that changed
+                for guild_id in dirty_guilds:
+                    path = os.path.join(self.data_dir, f"{guild_id}.json")
+                    if guild_id in self.xp_data:
+                        await self._dump_json_atomic(path, self.xp_data[guild_id])
+                    elif os.path.exists(path):
+                        os.remove(path)
+                    self._legacy_guilds.discard(guild_id)
+                if self._legacy_file_pending and not self._legacy_guilds:
+                    # Every guild now has its own shard, so the legacy file can be retired
+                    os.replace(self.data_file, self.data_file + '.migrated')
+                    self._legacy_file_pending = False
+                await self._compact_xp_log(log_offset)
+                await self._dump_json_atomic(self.roles_file, self.level_roles)
+                await self.save_level_messages()
+                await self.save_backgrounds()
+            except Exception as e:
+                # Keep the marks so the next save retries these guilds
+                self._dirty_guilds |= dirty_guilds
+                logger.error(f"Error saving data: {e}")
             
     async def save_level_messages(self):
         """Save level message templates to file"""
         try:
-            with open(self.messages_file, 'w') as f:
-                json.dump(self.level_messages, f)
+            await self._dump_json_atomic(self.messages_file, self.level_messages)
         except Exception as e:
             logger.error(f"Error saving level messages: {e}")
             
     async def save_backgrounds(self):
         """Save background image URLs to file"""
         try:
-            with open(self.backgrounds_file, 'w') as f:
-                json.dump(self.background_images, f)
+            await self._dump_json_atomic(self.backgrounds_file, self.background_images)
         except Exception as e:
             logger.error(f"Error saving background images: {e}")
             
-    def cog_unload(self):
+    async def _dump_json_atomic(self, path: str, obj):
+        """Serialize obj and atomically write it to path off the event loop"""
+        # Serialize on the loop so the snapshot can't race with in-flight mutations
+        content = json_dumps(obj)
+        await asyncio.to_thread(write_file_atomic, path, content)
+
+    async def _json_flusher(self, dirty: asyncio.Event, path: str, get_data):
+        """Coalesce changes flagged on dirty into at most one write to path per 500ms"""
+        while True:
+            await dirty.wait()
+            await asyncio.sleep(0.5)
+            dirty.clear()
+            try:
+                await self._dump_json_atomic(path, get_data())
+            except Exception as e:
+                logger.error(f"Error saving {path}: {e}")
+
+    def _flush_pending_json(self):
+        """Write any debounced files that still have pending changes (blocking)"""
+        for dirty, path, data in (
+            (self._roles_dirty, self.roles_file, self.level_roles),
+            (self._bg_dirty, self.backgrounds_file, self.background_images),
+        ):
+            if dirty.is_set():
+                try:
+                    write_file_atomic(path, json_dumps(data))
+                    dirty.clear()
+                except Exception as e:
+                    logger.error(f"Error saving {path}: {e}")
+            
+    async def cog_unload(self):
         self.save_task.cancel()
+        for task in self._flush_tasks:
+            task.cancel()
+        if self._img_pool:
+            self._img_pool.shutdown(wait=False)
+        if self._http:
+            await self._http.close()
+        # Flush any pending changes before the cog goes away
+        self._flush_pending_json()
+        if self._dirty_guilds:
+            await self.save_data()
+        if self._xp_log:
+            self._xp_log.close()
+            self._xp_log = None
         # No need to manually remove commands as discord.py handles this automatically
         # when using the GroupCog approach
         
     @tasks.loop(minutes=5)
     async def save_task(self):
-        """Periodically save data"""
-        await self.save_data()
-        await self.save_level_messages()
+        """Periodically save XP changes buffered by on_message"""
+        if self._dirty_guilds:
+            await self.save_data()
         
     @save_task.before_loop
     async def before_save(self):
@@ -1193,11 +1748,25 @@ class Leveling(commands.GroupCog, name="level"):
         
     def get_xp_for_level(self, level: int) -> int:
         """Calculate XP needed for a level"""
-        return 5 * (level ** 2) + 50 * level + 100
+        if 0 <= level < len(self._xp_table):
+            return self._xp_table[level]
+        return 5 * level * level + 50 * level + 100
+        
+    def get_total_xp_for_level(self, level: int) -> int:
+        """Calculate total XP needed to reach a level"""
+        if level <= 0:
+            return 0
+        if level <= len(self._cum_xp):
+            return self._cum_xp[level - 1]
+        return self._cum_xp[-1] + sum(self.get_xp_for_level(l) for l in range(len(self._cum_xp), level))
         
     def get_level_from_xp(self, xp: int) -> int:
         """Calculate level from XP"""
-        level = 0
+        # Number of levels whose cumulative threshold has been reached
+        level = bisect.bisect_right(self._cum_xp, xp)
+        if level < len(self._cum_xp):
+            return level
+        xp -= self._cum_xp[-1]
         while xp >= self.get_xp_for_level(level):
             xp -= self.get_xp_for_level(level)
             level += 1
@@ -1253,18 +1822,24 @@ class Leveling(commands.GroupCog, name="level"):
             # Add XP (random amount between min and max)
             xp_gained = random.randint(self.min_xp, self.max_xp)
             self.xp_data[guild_id][user_id]["xp"] += xp_gained
+            self._update_rank_index(
+                guild_id, user_id,
+                self.xp_data[guild_id][user_id]["xp"] - xp_gained,
+                self.xp_data[guild_id][user_id]["xp"]
+            )
             
             # Calculate level threshold
-            current_xp = self.xp_data[guild_id][user_id]["xp"]
-            current_level = self.xp_data[guild_id][user_id]["level"]
+            user_data = self.xp_data[guild_id][user_id]
+            current_xp = user_data["xp"]
+            current_level = user_data["level"]
             
-            # Check if user should level up
+            # Check if user should level up (a lookup in the precomputed _xp_table)
             xp_needed = self.get_xp_for_level(current_level + 1)
             
             if current_xp >= xp_needed:
                 # Level up!
-                self.xp_data[guild_id][user_id]["level"] += 1
-                new_level = self.xp_data[guild_id][user_id]["level"]
+                user_data["level"] += 1
+                new_level = user_data["level"]
                 
                 # Check if we should send a level up message
                 if self.should_announce(message.channel):
@@ -1280,16 +1855,19 @@ class Leveling(commands.GroupCog, name="level"):
                         # Send the message
                         await message.channel.send(embed=embed)
                     except Exception as e:
-                        print(f"Error sending level up message: {e}")
+                        logger.error(f"Error sending level up message: {e}")
                 
                 # Check if there's a role reward for this level
                 await self.check_level_roles(message.author, new_level)
             
-            # Save after every message to avoid data loss
-            await self.save_data()
+            # Log the update now; save_task rewrites the snapshot later
+            self._append_xp_log(guild_id, user_id, self.xp_data[guild_id][user_id])
+            self._mark_dirty(guild_id)
+            if self._pending_updates >= self.max_pending_updates:
+                await self.save_data()
             
         except Exception as e:
-            print(f"Error in leveling system: {e}")
+            logger.error(f"Error in leveling system: {e}")
             # Don't re-raise the exception to prevent the bot from crashing
 
     def get_level_up_message(self, guild_id: str, level: int, user) -> str:
@@ -1320,9 +1898,12 @@ class Leveling(commands.GroupCog, name="level"):
             message_template = self.get_level_up_message(guild_id, new_level, message.author)
             
             # Format the message
-            level_message = message_template.replace("{user}", message.author.mention)
-            level_message = level_message.replace("{level}", str(new_level))
-            level_message = level_message.replace("{server}", message.guild.name)
+            level_message = _render_template(
+                message_template,
+                user=message.author.mention,
+                level=new_level,
+                server=message.guild.name
+            )
             
             # Create a more attractive level up message with ping
             embed = discord.Embed(
@@ -1336,45 +1917,79 @@ class Leveling(commands.GroupCog, name="level"):
             embed.set_footer(text=f"Keep chatting to earn more XP! | {message.guild.name}")
             
             # Find a channel to send the message
-            sent_message = False
-            for channel in message.guild.text_channels:
-                if channel.permissions_for(message.guild.me).send_messages:
-                    try:
-                        # Use plain text first with user ping to guarantee notification
-                        notification_text = f"{message.author.mention} just reached level {new_level}!"
-                        await channel.send(notification_text)
-                        await channel.send(embed=embed)
-                        sent_message = True
-                        break
-                    except Exception as e:
-                        logger.error(f"Error sending level up message: {e}")
-                        continue
+            target_channel = None
+            for channel in self._announce_channels(message.guild):
+                try:
+                    # Use plain text first with user ping to guarantee notification
+                    notification_text = f"{message.author.mention} just reached level {new_level}!"
+                    await channel.send(notification_text)
+                    await channel.send(embed=embed)
+                    self._announce_channel_cache[message.guild.id] = channel.id
+                    target_channel = channel
+                    break
+                except Exception as e:
+                    logger.error(f"Error sending level up message: {e}")
+                    continue
             
-            if not sent_message:
+            if target_channel is None:
                 logger.warning(f"Could not find a suitable channel to send level up notification in {message.guild.name}")
                 
             # Check for role assignment
             if guild_id in self.level_roles and str(new_level) in self.level_roles[guild_id]:
                 role_id = self.level_roles[guild_id][str(new_level)]
-                role = message.guild.get_role(int(role_id))
+                role = self._get_role_cache(message.guild).get(int(role_id))
                 if role:
                     try:
                         await message.author.add_roles(role)
-                        # Send additional message if role was awarded
-                        if sent_message:  # Only try to send if we found a channel earlier
-                            for channel in message.guild.text_channels:
-                                if channel.permissions_for(message.guild.me).send_messages:
-                                    try:
-                                        await channel.send(f"🏆 {message.author.mention} has earned the **{role.name}** role for reaching level {new_level}!")
-                                        break
-                                    except Exception as e:
-                                        logger.error(f"Error sending role award message: {e}")
-                                        continue
+                        # Send additional message if role was awarded, in the channel used above
+                        if target_channel:
+                            try:
+                                await target_channel.send(f"🏆 {message.author.mention} has earned the **{role.name}** role for reaching level {new_level}!")
+                            except Exception as e:
+                                logger.error(f"Error sending role award message: {e}")
                     except discord.Forbidden:
                         logger.error(f"Failed to assign level role to {message.author} in {message.guild}: Missing permissions")
         except Exception as e:
             logger.error(f"Error in handle_level_up: {e}")
 
+    def _load_fonts(self) -> dict:
+        """Load the card font at every size the renderers use"""
+        sizes = (18, 24, 28, 36)
+        if not os.path.exists(self.font_path):
+            # Fallback to default
+            default = ImageFont.load_default()
+            return {size: default for size in sizes}
+        return {size: ImageFont.truetype(self.font_path, size) for size in sizes}
+
+    async def _ensure_font(self):
+        """Download the card font if it's missing, then (re)load it"""
+        if not os.path.exists(self.font_path):
+            try:
+                font_url = "https://github.com/google/fonts/raw/main/apache/roboto/static/Roboto-Regular.ttf"
+                async with self._http.get(font_url) as resp:
+                    if resp.status == 200:
+                        font_data = await resp.read()
+                        await asyncio.to_thread(write_file_atomic, self.font_path, font_data)
+            except Exception as e:
+                logger.error(f"Error downloading font: {e}")
+        try:
+            self._fonts = await asyncio.to_thread(self._load_fonts)
+            self._fonts_truetype = os.path.exists(self.font_path)
+        except Exception as e:
+            logger.error(f"Error loading fonts: {e}")
+
+    async def _fetch_image(self, key: str, url: str) -> Optional[bytes]:
+        """Download image bytes, reusing a recent download with the same key"""
+        data = self._img_cache.get(key)
+        if data is None:
+            async with self._http.get(url) as resp:
+                if resp.status != 200:
+                    return None
+                data = await resp.read()
+            if len(data) <= self._img_cache.maxsize:
+                self._img_cache[key] = data
+        return data
+
     async def generate_level_card(
         self, 
         member: discord.Member,
@@ -1388,185 +2003,198 @@ class Leveling(commands.GroupCog, name="level"):
         theme: str = "default"
     ) -> io.BytesIO:
         """Generate a level card with custom background if available"""
+        # Check if user has a custom background
+        background_url = None
+        if guild_id in self.background_images and user_id in self.background_images[guild_id]:
+            background_url = self.background_images[guild_id][user_id]
+        
+        # Download custom background
+        background_data = None
+        if background_url:
+            try:
+                background_data = await self._fetch_image(background_url, background_url)
+            except Exception as e:
+                logger.error(f"Error loading background image: {e}")
+        
+        # Retry the font download if it failed at load time
+        if not self._fonts_truetype:
+            await self._ensure_font()
+        
+        # Get user avatar
+        avatar_key = member.display_avatar.key
+        avatar = None
+        try:
+            avatar = await self._load_avatar(member.display_avatar, 150)
+        except Exception as e:
+            logger.error(f"Error loading avatar: {e}")
+        
+        # Pillow releases the GIL while resizing/encoding, so cards render in parallel
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._img_pool,
+            self._render_level_card,
+            background_data, avatar_key, avatar, member.display_name,
+            level, xp, next_level_xp, percentage, rank, theme
+        )
+    
+    def _encode_png(self, image: Image.Image, **params) -> io.BytesIO:
+        """Encode image as PNG into a new buffer, rewound for discord.File"""
+        buf = io.BytesIO()
+        image.save(buf, format="PNG", **params)
+        buf.seek(0)
+        return buf
+
+    async def _load_avatar(self, asset: discord.Asset, size: int) -> Union[Image.Image, bytes, None]:
+        """Return the cached circular avatar tile, or read the avatar bytes to build one"""
+        key = asset.key
+        with self._avatar_tiles_lock:
+            tile = self._avatar_tiles.get((key, size))
+        if tile is not None:
+            return tile
+        data = self._img_cache.get(key)
+        if data is None:
+            # Avatar keys are content hashes, so a file on disk never goes stale
+            path = os.path.join(self.avatar_cache_dir, f"{key}.png")
+            data = await asyncio.to_thread(self._read_file, path)
+            if data is None:
+                # Goes through discord.py's own HTTP client rather than our session
+                data = await asset.with_format("png").with_size(256).read()
+                try:
+                    await asyncio.to_thread(write_file_atomic, path, data)
+                except OSError as e:
+                    logger.warning(f"Could not cache avatar {key}: {e}")
+            if len(data) <= self._img_cache.maxsize:
+                self._img_cache[key] = data
+        return data
+
+    def _read_file(self, path: str) -> Optional[bytes]:
+        """Return a file's bytes, or None if it doesn't exist"""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # Bump the mtime so _prune_avatar_cache sees the file as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def _prune_avatar_cache(self):
+        """Delete cached avatars unused for avatar_cache_max_age, then the oldest past avatar_cache_max_files (blocking)"""
+        try:
+            entries = sorted(
+                ((entry.stat().st_mtime, entry.path) for entry in os.scandir(self.avatar_cache_dir) if entry.is_file()),
+                reverse=True
+            )
+        except OSError as e:
+            logger.warning(f"Could not scan avatar cache: {e}")
+            return
+        cutoff = time.time() - self.avatar_cache_max_age
+        removed = 0
+        for i, (mtime, path) in enumerate(entries):
+            if i >= self.avatar_cache_max_files or mtime < cutoff:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        if removed:
+            logger.info(f"Pruned {removed} cached avatars from {self.avatar_cache_dir}")
+
+    def _avatar_tile(self, key: str, avatar: Union[Image.Image, bytes, None], size: int) -> Optional[Image.Image]:
+        """Turn avatar bytes into a masked circle of the given size and cache it (blocking)"""
+        if avatar is None or isinstance(avatar, Image.Image):
+            return avatar
+        
+        tile = Image.open(io.BytesIO(avatar)).convert("RGBA")
+        tile = tile.resize((size, size), Image.LANCZOS)
+        
+        # Circular mask for avatar (already size x size, so no ImageOps.fit needed)
+        tile.putalpha(self._avatar_masks[size])
+        
+        with self._avatar_tiles_lock:
+            self._avatar_tiles[(key, size)] = tile
+        return tile
+
+    def _render_level_card(
+        self,
+        background_data: Optional[bytes],
+        avatar_key: str,
+        avatar: Union[Image.Image, bytes, None],
+        display_name: str,
+        level: int,
+        xp: int,
+        next_level_xp: int,
+        percentage: int,
+        rank: int,
+        theme: str
+    ) -> io.BytesIO:
+        """Draw a level card (blocking, runs in the image thread pool)"""
         # Constants for card dimensions
         card_width = 800
         card_height = 250
         
-        # Theme colors
-        theme_colors = {
-            "default": {
-                "bg": (47, 49, 54, 255),
-                "overlay": (0, 0, 0, 128),
-                "progress_bg": (100, 100, 100, 128),
-                "progress_fill": (88, 101, 242, 255),  # Discord blurple
-                "text": (255, 255, 255, 255)
-            },
-            "dark": {
-                "bg": (30, 30, 30, 255),
-                "overlay": (0, 0, 0, 180),
-                "progress_bg": (50, 50, 50, 180),
-                "progress_fill": (100, 100, 100, 255),
-                "text": (220, 220, 220, 255)
-            },
-            "light": {
-                "bg": (240, 240, 240, 255),
-                "overlay": (255, 255, 255, 180),
-                "progress_bg": (200, 200, 200, 180),
-                "progress_fill": (150, 150, 150, 255),
-                "text": (30, 30, 30, 255)
-            },
-            "blue": {
-                "bg": (53, 109, 187, 255),
-                "overlay": (0, 0, 128, 120),
-                "progress_bg": (70, 130, 180, 150),
-                "progress_fill": (30, 144, 255, 255),
-                "text": (255, 255, 255, 255)
-            },
-            "green": {
-                "bg": (46, 139, 87, 255),
-                "overlay": (0, 100, 0, 120),
-                "progress_bg": (60, 179, 113, 150),
-                "progress_fill": (34, 139, 34, 255),
-                "text": (255, 255, 255, 255)
-            },
-            "red": {
-                "bg": (178, 34, 34, 255),
-                "overlay": (139, 0, 0, 120),
-                "progress_bg": (205, 92, 92, 150),
-                "progress_fill": (220, 20, 60, 255),
-                "text": (255, 255, 255, 255)
-            },
-            "purple": {
-                "bg": (106, 90, 205, 255),
-                "overlay": (75, 0, 130, 120),
-                "progress_bg": (147, 112, 219, 150),
-                "progress_fill": (138, 43, 226, 255),
-                "text": (255, 255, 255, 255)
-            },
-            "gold": {
-                "bg": (184, 134, 11, 255),
-                "overlay": (139, 69, 19, 120),
-                "progress_bg": (218, 165, 32, 150),
-                "progress_fill": (255, 215, 0, 255),
-                "text": (255, 255, 255, 255)
-            }
-        }
-        
         # Use default theme if specified theme doesn't exist
-        if theme not in theme_colors:
-            theme = "default"
-            
-        colors = theme_colors[theme]
-        
-        # Check if user has a custom background
-        background_url = None
-        if guild_id in self.background_images and user_id in self.background_images[guild_id]:
-            background_url = self.background_images[guild_id][user_id]
+        colors = _CARD_THEMES.get(theme, _CARD_THEMES["default"])
         
         try:
             # Create base image
-            if background_url:
-                # Download custom background
+            background = None
+            if background_data:
                 try:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(background_url) as resp:
-                            if resp.status == 200:
-                                image_data = await resp.read()
-                                background = Image.open(io.BytesIO(image_data)).convert("RGBA")
-                                
-                                # Resize and crop to fit card dimensions
-                                bg_ratio = background.width / background.height
-                                card_ratio = card_width / card_height
-                                
-                                if bg_ratio > card_ratio:
-                                    # Image is wider than card
-                                    new_width = int(card_height * bg_ratio)
-                                    background = background.resize((new_width, card_height), Image.LANCZOS)
-                                    # Crop center
-                                    left = (background.width - card_width) // 2
-                                    background = background.crop((left, 0, left + card_width, card_height))
-                                else:
-                                    # Image is taller than card
-                                    new_height = int(card_width / bg_ratio)
-                                    background = background.resize((card_width, new_height), Image.LANCZOS)
-                                    # Crop center
-                                    top = (background.height - card_height) // 2
-                                    background = background.crop((0, top, card_width, top + card_height))
-                            else:
-                                # Fallback to default if download fails
-                                background = Image.new("RGBA", (card_width, card_height), colors["bg"])
+                    background = Image.open(io.BytesIO(background_data)).convert("RGBA")
+                    
+                    # Resize and crop to fit card dimensions
+                    bg_ratio = background.width / background.height
+                    card_ratio = card_width / card_height
+                    
+                    if bg_ratio > card_ratio:
+                        # Image is wider than card
+                        new_width = int(card_height * bg_ratio)
+                        background = background.resize((new_width, card_height), Image.LANCZOS)
+                        # Crop center
+                        left = (background.width - card_width) // 2
+                        background = background.crop((left, 0, left + card_width, card_height))
+                    else:
+                        # Image is taller than card
+                        new_height = int(card_width / bg_ratio)
+                        background = background.resize((card_width, new_height), Image.LANCZOS)
+                        # Crop center
+                        top = (background.height - card_height) // 2
+                        background = background.crop((0, top, card_width, top + card_height))
                 except Exception as e:
                     logger.error(f"Error loading background image: {e}")
-                    background = Image.new("RGBA", (card_width, card_height), colors["bg"])
+                    background = None
+            if background is None:
+                # Use default background, pre-blended with the overlay
+                background = Image.new("RGBA", (card_width, card_height), colors["bg_final"])
             else:
-                # Use default background
-                background = Image.new("RGBA", (card_width, card_height), colors["bg"])
-            
-            # Create transparent overlay for better text readability
-            overlay = Image.new("RGBA", (card_width, card_height), colors["overlay"])
-            background = Image.alpha_composite(background, overlay)
+                # Create transparent overlay for better text readability
+                overlay = Image.new("RGBA", (card_width, card_height), colors["overlay"])
+                background = Image.alpha_composite(background, overlay)
             
             # Create a drawing context
             draw = ImageDraw.Draw(background)
             
-            # Try to use a nice font if available
-            font_path = os.path.join(self.fonts_dir, "Roboto-Regular.ttf")
-            if not os.path.exists(font_path):
-                # Download the font if it doesn't exist
-                os.makedirs(self.fonts_dir, exist_ok=True)
+            font_large = self._fonts[36]
+            font_medium = self._fonts[24]
+            font_small = self._fonts[18]
+            
+            # Draw user avatar
+            if avatar is not None:
                 try:
-                    async with aiohttp.ClientSession() as session:
-                        font_url = "https://github.com/google/fonts/raw/main/apache/roboto/static/Roboto-Regular.ttf"
-                        async with session.get(font_url) as resp:
-                            if resp.status == 200:
-                                font_data = await resp.read()
-                                with open(font_path, 'wb') as f:
-                                    f.write(font_data)
-                except Exception as e:
-                    logger.error(f"Error downloading font: {e}")
+                    avatar_circle = self._avatar_tile(avatar_key, avatar, 150)
                     
-            # Check again if font exists after download attempt
-            if not os.path.exists(font_path):
-                # Fallback to default
-                font_large = ImageFont.load_default()
-                font_medium = ImageFont.load_default()
-                font_small = ImageFont.load_default()
-            else:
-                font_large = ImageFont.truetype(font_path, 36)
-                font_medium = ImageFont.truetype(font_path, 24)
-                font_small = ImageFont.truetype(font_path, 18)
-            
-            # Get user avatar
-            try:
-                avatar_url = member.display_avatar.url
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(str(avatar_url)) as resp:
-                        if resp.status == 200:
-                            avatar_data = await resp.read()
-                            avatar = Image.open(io.BytesIO(avatar_data)).convert("RGBA")
-                            
-                            # Resize avatar
-                            avatar = avatar.resize((150, 150), Image.LANCZOS)
-                            
-                            # Create circular mask for avatar
-                            mask = Image.new("L", (150, 150), 0)
-                            draw_mask = ImageDraw.Draw(mask)
-                            draw_mask.ellipse((0, 0, 150, 150), fill=255)
-                            
-                            # Apply mask to avatar
-                            avatar_circle = ImageOps.fit(avatar, mask.size, centering=(0.5, 0.5))
-                            avatar_circle.putalpha(mask)
-                            
-                            # Paste avatar on card
-                            background.paste(avatar_circle, (40, 50), avatar_circle)
-            except Exception as e:
-                logger.error(f"Error loading avatar: {e}")
-                # Skip avatar if error
+                    # Paste avatar on card
+                    background.paste(avatar_circle, (40, 50), avatar_circle)
+                except Exception as e:
+                    logger.error(f"Error loading avatar: {e}")
+                    # Skip avatar if error
             
             # Draw username
-            username = member.display_name
-            if len(username) > 15:
-                username = username[:12] + "..."
+            username = _truncate_name(display_name, 15)
             draw.text((220, 60), username, fill=colors["text"], font=font_large)
             
             # Draw level and XP
@@ -1598,249 +2226,167 @@ class Leveling(commands.GroupCog, name="level"):
             # Draw percentage text
             draw.text((220 + (bar_width // 2), 185), f"{percentage}%", fill=colors["text"], font=font_small, anchor="mm")
             
-            # Save image to bytes
-            output_buffer = io.BytesIO()
-            background.save(output_buffer, format="PNG")
-            output_buffer.seek(0)
-            
-            return output_buffer
+            # Save image to bytes (zlib level 1 encodes much faster for a few extra KB)
+            return self._encode_png(background, compress_level=1)
         except Exception as e:
             logger.error(f"Error generating level card: {e}")
             # Create a simple fallback card
             fallback = Image.new("RGBA", (card_width, card_height), (47, 49, 54, 255))
             draw = ImageDraw.Draw(fallback)
             draw.text((50, 50), f"Error generating card: {str(e)[:100]}", fill=(255, 0, 0, 255))
-            draw.text((50, 100), f"Username: {member.display_name}", fill=(255, 255, 255, 255))
+            draw.text((50, 100), f"Username: {display_name}", fill=(255, 255, 255, 255))
             draw.text((50, 150), f"Level: {level} | XP: {xp}/{next_level_xp}", fill=(255, 255, 255, 255))
             
             output_buffer = io.BytesIO()
-            fallback.save(output_buffer, format="PNG")
+            fallback.save(output_buffer, format="PNG", compress_level=1)
             output_buffer.seek(0)
             
             return output_buffer
     
     async def get_user_rank(self, guild_id: str, user_id: str) -> int:
         """Get user's rank in the server based on XP"""
-        if guild_id not in self.xp_data:
+        if guild_id not in self.xp_data or user_id not in self.xp_data[guild_id]:
             return 0
             
-        # Sort users by XP
-        sorted_users = sorted(
-            self.xp_data[guild_id].items(),
-            key=lambda x: x[1]["xp"],
-            reverse=True
-        )
+        index = self._rank_index.get(guild_id)
+        if index is None:
+            index = SortedList((data["xp"], uid) for uid, data in self.xp_data[guild_id].items())
+            self._rank_index[guild_id] = index
         
-        # Find user's position
-        for i, (uid, _) in enumerate(sorted_users, 1):
-            if uid == user_id:
-                return i
-                
-        return 0
+        # Users after this one in ascending order are ahead of it
+        xp = self.xp_data[guild_id][user_id]["xp"]
+        return len(index) - index.bisect_right((xp, user_id)) + 1
+
+    def _update_rank_index(self, guild_id: str, user_id: str, old_xp: int, new_xp: int):
+        """Move a user within the guild's rank index, if one has been built"""
+        index = self._rank_index.get(guild_id)
+        if index is not None:
+            index.discard((old_xp, user_id))
+            index.add((new_xp, user_id))
 
     async def generate_leaderboard_image(
         self,
         guild: discord.Guild,
-        sorted_users: list,
+        page_users: list,
         page: int,
         total_pages: int,
         per_page: int,
         theme: str = "default"
     ) -> io.BytesIO:
-        """Generate a visual leaderboard image"""
+        """Generate a visual leaderboard image for one page of (user_id, data) entries"""
+        start_idx = (page - 1) * per_page
+        
+        # Resolve members and download avatars before handing off to the renderer
+        async def _resolve(rank, user_id, data):
+            avatar_key = None
+            avatar = None
+            try:
+                member = guild.get_member(int(user_id))
+                username = member.display_name if member else f"Unknown User ({user_id})"
+                
+                # Get avatar if possible
+                if member and member.display_avatar:
+                    avatar_key = member.display_avatar.key
+                    async with self._avatar_fetch_limit:
+                        avatar = await self._load_avatar(member.display_avatar, 80)
+            except Exception as e:
+                logger.error(f"Error loading user data for leaderboard: {e}")
+                username = f"Unknown User ({user_id})"
+            return (rank, username, avatar_key, avatar, data)
+        
+        # Fetch the whole page's avatars concurrently rather than one after another
+        entries = await asyncio.gather(*(
+            _resolve(rank, user_id, data)
+            for rank, (user_id, data) in enumerate(page_users, start=start_idx + 1)
+        ))
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._img_pool,
+            self._render_leaderboard_image,
+            guild.name, guild.member_count, entries, page, total_pages, theme
+        )
+    
+    def _render_leaderboard_image(
+        self,
+        guild_name: str,
+        member_count: int,
+        entries: list,
+        page: int,
+        total_pages: int,
+        theme: str
+    ) -> io.BytesIO:
+        """Draw a leaderboard page (blocking, runs in the image thread pool)"""
         # Constants for image dimensions
         image_width = 800
         image_height = 600
         
-        # Theme colors
-        theme_colors = {
-            "default": {
-                "bg": (47, 49, 54, 255),
-                "header_bg": (32, 34, 37, 255),
-                "entry_bg": (54, 57, 63, 255),
-                "highlight": (88, 101, 242, 255),  # Discord blurple
-                "text": (255, 255, 255, 255),
-                "subtext": (185, 187, 190, 255)
-            },
-            "dark": {
-                "bg": (30, 30, 30, 255),
-                "header_bg": (20, 20, 20, 255),
-                "entry_bg": (40, 40, 40, 255),
-                "highlight": (100, 100, 100, 255),
-                "text": (220, 220, 220, 255),
-                "subtext": (150, 150, 150, 255)
-            },
-            "light": {
-                "bg": (240, 240, 240, 255),
-                "header_bg": (230, 230, 230, 255),
-                "entry_bg": (250, 250, 250, 255),
-                "highlight": (150, 150, 150, 255),
-                "text": (30, 30, 30, 255),
-                "subtext": (100, 100, 100, 255)
-            },
-            "blue": {
-                "bg": (53, 109, 187, 255),
-                "header_bg": (41, 84, 144, 255),
-                "entry_bg": (65, 121, 199, 255),
-                "highlight": (30, 144, 255, 255),
-                "text": (255, 255, 255, 255),
-                "subtext": (220, 230, 242, 255)
-            },
-            "green": {
-                "bg": (46, 139, 87, 255),
-                "header_bg": (36, 107, 67, 255),
-                "entry_bg": (56, 157, 101, 255),
-                "highlight": (34, 139, 34, 255),
-                "text": (255, 255, 255, 255),
-                "subtext": (220, 240, 220, 255)
-            },
-            "red": {
-                "bg": (178, 34, 34, 255),
-                "header_bg": (139, 26, 26, 255),
-                "entry_bg": (205, 51, 51, 255),
-                "highlight": (220, 20, 60, 255),
-                "text": (255, 255, 255, 255),
-                "subtext": (255, 220, 220, 255)
-            },
-            "purple": {
-                "bg": (106, 90, 205, 255),
-                "header_bg": (85, 72, 164, 255),
-                "entry_bg": (122, 104, 220, 255),
-                "highlight": (138, 43, 226, 255),
-                "text": (255, 255, 255, 255),
-                "subtext": (230, 220, 250, 255)
-            },
-            "gold": {
-                "bg": (184, 134, 11, 255),
-                "header_bg": (139, 101, 8, 255),
-                "entry_bg": (205, 149, 12, 255),
-                "highlight": (255, 215, 0, 255),
-                "text": (255, 255, 255, 255),
-                "subtext": (255, 248, 220, 255)
-            }
-        }
-        
         # Use default theme if specified theme doesn't exist
-        if theme not in theme_colors:
+        if theme not in _LEADERBOARD_THEMES:
             theme = "default"
-            
-        colors = theme_colors[theme]
+        colors = _LEADERBOARD_THEMES[theme]
         
         try:
-            # Create base image
-            image = Image.new("RGBA", (image_width, image_height), colors["bg"])
+            # Start from a copy of the pre-drawn background and header
+            header_height = 80
+            image = _leaderboard_template(theme, image_width, image_height, header_height).copy()
             draw = ImageDraw.Draw(image)
             
-            # Try to use a nice font if available
-            font_path = os.path.join(self.fonts_dir, "Roboto-Regular.ttf")
-            if not os.path.exists(font_path):
-                # Fallback to default
-                font_title = ImageFont.load_default()
-                font_large = ImageFont.load_default()
-                font_medium = ImageFont.load_default()
-                font_small = ImageFont.load_default()
-            else:
-                font_title = ImageFont.truetype(font_path, 36)
-                font_large = ImageFont.truetype(font_path, 28)
-                font_medium = ImageFont.truetype(font_path, 24)
-                font_small = ImageFont.truetype(font_path, 18)
-            
-            # Draw header
-            header_height = 80
-            draw.rectangle(
-                ((0, 0), (image_width, header_height)),
-                fill=colors["header_bg"]
-            )
+            font_title = self._fonts[36]
+            font_large = self._fonts[28]
+            font_medium = self._fonts[24]
+            font_small = self._fonts[18]
             
             # Draw title
-            title = f"{guild.name} Leaderboard"
+            title = f"{guild_name} Leaderboard"
             draw.text((image_width // 2, header_height // 2), title, fill=colors["text"], font=font_title, anchor="mm")
             
             # Draw page info
             page_info = f"Page {page}/{total_pages}"
             draw.text((image_width - 20, header_height - 20), page_info, fill=colors["subtext"], font=font_small, anchor="rb")
             
-            # Get users for current page
-            start_idx = (page - 1) * per_page
-            end_idx = min(start_idx + per_page, len(sorted_users))
-            users_to_display = sorted_users[start_idx:end_idx]
-            
             # Draw leaderboard entries
             entry_height = 100
             entry_padding = 10
             y_offset = header_height + entry_padding
             
-            for rank, (user_id, data) in enumerate(users_to_display, start=start_idx + 1):
+            for rank, username, avatar_key, avatar, data in entries:
                 # Draw entry background
                 entry_bg_color = colors["entry_bg"]
                 if rank == 1:  # First place highlight
-                    entry_bg_color = tuple(int(c * 1.2) if c < 200 else c for c in colors["highlight"])
+                    entry_bg_color = colors["rank1_bg"]
                 elif rank == 2:  # Second place
-                    entry_bg_color = tuple(int(c * 1.1) if c < 220 else c for c in colors["entry_bg"])
+                    entry_bg_color = colors["rank2_bg"]
                 elif rank == 3:  # Third place
-                    entry_bg_color = tuple(int(c * 1.05) if c < 230 else c for c in colors["entry_bg"])
+                    entry_bg_color = colors["rank3_bg"]
                     
-                draw.rounded_rectangle(
-                    ((entry_padding, y_offset), (image_width - entry_padding, y_offset + entry_height)),
-                    radius=10,
-                    fill=entry_bg_color
-                )
+                entry_sprite = _rounded_sprite(image_width - 2 * entry_padding + 1, entry_height + 1, 10, entry_bg_color)
+                image.alpha_composite(entry_sprite, (entry_padding, y_offset))
                 
-                # Draw rank
+                # Draw rank badge from a cached sprite
                 rank_size = 40
-                rank_bg_color = colors["highlight"]
-                draw.ellipse(
-                    ((entry_padding + 10, y_offset + (entry_height - rank_size) // 2),
-                     (entry_padding + 10 + rank_size, y_offset + (entry_height + rank_size) // 2)),
-                    fill=rank_bg_color
-                )
-                draw.text(
-                    (entry_padding + 10 + rank_size // 2, y_offset + entry_height // 2),
-                    f"#{rank}",
-                    fill=colors["text"],
-                    font=font_medium,
-                    anchor="mm"
+                rank_badge = _rank_sprite(rank, rank_size, colors["highlight"], colors["text"], font_medium)
+                image.alpha_composite(
+                    rank_badge,
+                    (entry_padding + 10 + rank_size // 2 - rank_badge.width // 2,
+                     y_offset + entry_height // 2 - rank_badge.height // 2)
                 )
                 
-                # Try to get member info
-                try:
-                    member = guild.get_member(int(user_id))
-                    username = member.display_name if member else f"Unknown User ({user_id})"
-                    
-                    # Get avatar if possible
-                    if member and member.display_avatar:
-                        avatar_url = member.display_avatar.url
-                        async with aiohttp.ClientSession() as session:
-                            async with session.get(str(avatar_url)) as resp:
-                                if resp.status == 200:
-                                    avatar_data = await resp.read()
-                                    avatar = Image.open(io.BytesIO(avatar_data)).convert("RGBA")
-                                    
-                                    # Resize avatar
-                                    avatar_size = 80
-                                    avatar = avatar.resize((avatar_size, avatar_size), Image.LANCZOS)
-                                    
-                                    # Create circular mask for avatar
-                                    mask = Image.new("L", (avatar_size, avatar_size), 0)
-                                    draw_mask = ImageDraw.Draw(mask)
-                                    draw_mask.ellipse((0, 0, avatar_size, avatar_size), fill=255)
-                                    
-                                    # Apply mask to avatar
-                                    avatar_circle = ImageOps.fit(avatar, mask.size, centering=(0.5, 0.5))
-                                    avatar_circle.putalpha(mask)
-                                    
-                                    # Paste avatar on card
-                                    avatar_x = entry_padding + 80
-                                    avatar_y = y_offset + (entry_height - avatar_size) // 2
-                                    image.paste(avatar_circle, (avatar_x, avatar_y), avatar_circle)
-                
-                except Exception as e:
-                    logger.error(f"Error loading user data for leaderboard: {e}")
-                    username = f"Unknown User ({user_id})"
+                # Draw avatar if possible
+                if avatar is not None:
+                    try:
+                        avatar_size = 80
+                        avatar_circle = self._avatar_tile(avatar_key, avatar, avatar_size)
+                        
+                        # Paste avatar on card
+                        avatar_x = entry_padding + 80
+                        avatar_y = y_offset + (entry_height - avatar_size) // 2
+                        image.paste(avatar_circle, (avatar_x, avatar_y), avatar_circle)
+                    except Exception as e:
+                        logger.error(f"Error loading avatar for leaderboard: {e}")
                 
                 # Draw username (truncate if too long)
-                if len(username) > 20:
-                    username = username[:17] + "..."
+                username = _truncate_name(username, 20)
                 draw.text(
                     (entry_padding + 180, y_offset + entry_height // 3),
                     username,
@@ -1880,7 +2426,6 @@ class Leveling(commands.GroupCog, name="level"):
             )
             
             # Member count
-            member_count = guild.member_count
             member_text = f"Server Members: {member_count}"
             timestamp = f"Generated: {discord.utils.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC"
             
@@ -1900,12 +2445,8 @@ class Leveling(commands.GroupCog, name="level"):
                 anchor="rm"
             )
             
-            # Save image to bytes
-            output_buffer = io.BytesIO()
-            image.save(output_buffer, format="PNG")
-            output_buffer.seek(0)
-            
-            return output_buffer
+            # Save image to bytes (zlib level 1, as for level cards)
+            return self._encode_png(image, compress_level=1)
         except Exception as e:
             logger.error(f"Error generating leaderboard image: {e}")
             # Create a simple fallback
@@ -1913,15 +2454,13 @@ class Leveling(commands.GroupCog, name="level"):
             draw = ImageDraw.Draw(fallback)
             
             draw.text((50, 50), f"Error generating leaderboard: {str(e)[:100]}", fill=(255, 0, 0, 255))
-            draw.text((50, 100), f"Server: {guild.name}", fill=(255, 255, 255, 255))
+            draw.text((50, 100), f"Server: {guild_name}", fill=(255, 255, 255, 255))
             draw.text((50, 150), f"Page: {page}/{total_pages}", fill=(255, 255, 255, 255))
             
             # Attempt to still list some users in text format
             y_pos = 200
-            for rank, (user_id, data) in enumerate(sorted_users[start_idx:end_idx], start=start_idx + 1):
+            for rank, username, _, _, data in entries:
                 try:
-                    member = guild.get_member(int(user_id))
-                    username = member.display_name if member else f"Unknown User ({user_id})"
                     text = f"#{rank}: {username} - Level {data['level']} (XP: {data['xp']})"
                     draw.text((50, y_pos), text, fill=(255, 255, 255, 255))
                     y_pos += 40
@@ -1929,19 +2468,17 @@ class Leveling(commands.GroupCog, name="level"):
                     pass
             
             output_buffer = io.BytesIO()
-            fallback.save(output_buffer, format="PNG")
+            fallback.save(output_buffer, format="PNG", compress_level=1)
             output_buffer.seek(0)
             
             return output_buffer
 
     async def save_level_roles(self):
         try:
-            # Ensure the data is properly formatted
-            with open('level_roles.json', 'w') as f:
-                json.dump(self.level_roles, f, indent=4)
-            print("Level roles data saved successfully")
+            await self._dump_json_atomic(self.roles_file, self.level_roles)
+            logger.debug("Level roles data saved successfully")
         except Exception as e:
-            print(f"Error saving level roles data: {e}")
+            logger.error(f"Error saving level roles data: {e}")
 
     @app_commands.command(name="rolereward", description="Set a role reward for reaching a specific level")
     @app_commands.default_permissions(manage_roles=True)
@@ -1970,6 +2507,7 @@ class Leveling(commands.GroupCog, name="level"):
                 
             # Add or update the role reward
             self.level_roles[guild_id][str(level)] = role.id
+            self._rebuild_sorted_level_roles(guild_id)
             await self.save_level_roles()
             
             embed = discord.Embed(
@@ -1983,7 +2521,7 @@ class Leveling(commands.GroupCog, name="level"):
             
         except Exception as e:
             await interaction.response.send_message(f"An error occurred: {e}", ephemeral=True)
-            print(f"Error in role_reward command: {e}")
+            logger.error(f"Error in role_reward command: {e}")
 
     def calculate_xp_for_level(self, level):
         return 5 * (level ** 2) + 50 * level + 100
@@ -1996,9 +2534,9 @@ class Leveling(commands.GroupCog, name="level"):
             if role:
                 try:
                     await member.add_roles(role)
-                    print(f"Added role {role.name} to {member.name}")
+                    logger.debug(f"Added role {role.name} to {member.name}")
                 except Exception as e:
-                    print(f"Error adding role {role.name} to {member.name}: {e}")
+                    logger.error(f"Error adding role {role.name} to {member.name}: {e}")
 
 # Confirmation view for dangerous operations
 class ConfirmView(discord.ui.View):
@@ -2,11 +2,13 @@
 Storage abstraction layer for leveling data.
 Supports both MongoDB and JSON file storage with automatic fallback.
 """
-import json
+import asyncio
 import os
 import logging
 from typing import Dict, Optional, Any
+from sortedcontainers import SortedList
 import config
+from jsonio import json_loads, json_dumps, write_file_atomic
 
 logger = logging.getLogger("bot")
 
@@ -15,7 +17,8 @@ class LevelingStorage:
     
     def __init__(self):
         self.use_db = config.USE_MONGODB
-        self.json_file = 'leveling.json'
+        self.json_file = 'leveling.json'  # legacy single file, split into data_dir on first save
+        self.data_dir = 'leveling'  # one {guild_id}.json per guild
         self.settings_file = 'leveling_settings.json'
         self.roles_file = 'level_roles.json'
         self.messages_file = 'level_messages.json'
@@ -28,47 +31,127 @@ class LevelingStorage:
         self.messages = {}
         self.backgrounds = {}
         
+        # Per-guild SortedList[(xp, user_id)] for leaderboards, built lazily. Callers mutate the
+        # dicts they get back before calling set_user_data, so the indexed XP is tracked separately.
+        self._xp_index: Dict[str, SortedList] = {}
+        self._indexed_xp: Dict[str, Dict[str, int]] = {}
+        
+        # JSON mode: attribute name -> file, and which ones changed since the last flush.
+        # User data is sharded per guild and tracked in _dirty_guilds instead.
+        self._files = {
+            'settings': self.settings_file,
+            'roles': self.roles_file,
+            'messages': self.messages_file,
+            'backgrounds': self.backgrounds_file,
+        }
+        self._dirty = dict.fromkeys(self._files, False)
+        self._dirty_guilds = set()
+        # Guilds from the legacy json_file that have no shard yet; the file is kept until this empties
+        self._legacy_guilds = set()
+        self._legacy_file_pending = False
+        self._flush_task: Optional[asyncio.Task] = None
+        self.flush_interval = 5  # seconds between batched writes
+        
         if not self.use_db:
+            os.makedirs(self.data_dir, exist_ok=True)
             self._load_json()
     
     def _load_json(self):
         """Load data from JSON files."""
         try:
+            shards = [name for name in os.listdir(self.data_dir) if name.endswith('.json')]
+            for name in shards:
+                with open(os.path.join(self.data_dir, name), 'rb') as f:
+                    self.data[name[:-len('.json')]] = json_loads(f.read())
             if os.path.exists(self.json_file):
-                with open(self.json_file, 'r') as f:
-                    self.data = json.load(f)
+                # A split that stopped partway leaves both; shards are newer for the guilds they cover
+                with open(self.json_file, 'rb') as f:
+                    legacy = json_loads(f.read())
+                self._legacy_guilds = set(legacy) - set(self.data)
+                for guild_id in self._legacy_guilds:
+                    self.data[guild_id] = legacy[guild_id]
+                # Split the rest into per-guild shards on the next save
+                self._dirty_guilds.update(self._legacy_guilds)
+                self._legacy_file_pending = True
             if os.path.exists(self.settings_file):
-                with open(self.settings_file, 'r') as f:
-                    self.settings = json.load(f)
+                with open(self.settings_file, 'rb') as f:
+                    self.settings = json_loads(f.read())
             if os.path.exists(self.roles_file):
-                with open(self.roles_file, 'r') as f:
-                    self.roles = json.load(f)
+                with open(self.roles_file, 'rb') as f:
+                    self.roles = json_loads(f.read())
             if os.path.exists(self.messages_file):
-                with open(self.messages_file, 'r') as f:
-                    self.messages = json.load(f)
+                with open(self.messages_file, 'rb') as f:
+                    self.messages = json_loads(f.read())
             if os.path.exists(self.backgrounds_file):
-                with open(self.backgrounds_file, 'r') as f:
-                    self.backgrounds = json.load(f)
+                with open(self.backgrounds_file, 'rb') as f:
+                    self.backgrounds = json_loads(f.read())
         except Exception as e:
             logger.error(f"Error loading leveling JSON data: {e}")
     
     async def save_json(self):
-        """Save data to JSON files."""
+        """Save changed data to JSON files."""
         if self.use_db:
             return  # Don't save to JSON if using MongoDB
-        try:
-            with open(self.json_file, 'w') as f:
-                json.dump(self.data, f, indent=2)
-            with open(self.settings_file, 'w') as f:
-                json.dump(self.settings, f, indent=2)
-            with open(self.roles_file, 'w') as f:
-                json.dump(self.roles, f, indent=2)
-            with open(self.messages_file, 'w') as f:
-                json.dump(self.messages, f, indent=2)
-            with open(self.backgrounds_file, 'w') as f:
-                json.dump(self.backgrounds, f, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving leveling JSON data: {e}")
+        dirty_guilds, self._dirty_guilds = self._dirty_guilds, set()
+        for guild_id in dirty_guilds:
+            path = os.path.join(self.data_dir, f"{guild_id}.json")
+            try:
+                if guild_id in self.data:
+                    content = json_dumps(self.data[guild_id], indent=True)
+                    await asyncio.to_thread(write_file_atomic, path, content)
+                elif os.path.exists(path):
+                    os.remove(path)
+                self._legacy_guilds.discard(guild_id)
+            except Exception as e:
+                self._dirty_guilds.add(guild_id)
+                logger.error(f"Error saving leveling JSON data to {path}: {e}")
+        if self._legacy_file_pending and not self._legacy_guilds:
+            # Every guild now has its own shard, so the legacy file can be retired
+            try:
+                os.replace(self.json_file, self.json_file + '.migrated')
+                self._legacy_file_pending = False
+            except OSError as e:
+                logger.error(f"Error retiring {self.json_file}: {e}")
+        for attr, path in self._files.items():
+            if not self._dirty[attr]:
+                continue
+            self._dirty[attr] = False
+            try:
+                # Serialize here so the dict can't change mid-dump; only the write leaves the loop
+                content = json_dumps(getattr(self, attr), indent=True)
+                await asyncio.to_thread(write_file_atomic, path, content)
+            except Exception as e:
+                self._dirty[attr] = True
+                logger.error(f"Error saving leveling JSON data to {path}: {e}")
+    
+    def _mark_dirty(self, attr: str):
+        """Schedule a batched write of one JSON file."""
+        self._dirty[attr] = True
+        self._schedule_flush()
+    
+    def _mark_guild_dirty(self, guild_id: str):
+        """Schedule a batched write of one guild's user data shard."""
+        self._dirty_guilds.add(guild_id)
+        self._schedule_flush()
+    
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+    
+    async def _flush_loop(self):
+        """Write dirty files every flush_interval seconds until nothing is left to write."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.save_json()
+            if not self._dirty_guilds and not any(self._dirty.values()):
+                return
+    
+    async def close(self):
+        """Stop the flush task and write any pending changes."""
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.save_json()
     
     async def get_user_data(self, guild_id: str, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user leveling data."""
@@ -89,6 +172,8 @@ class LevelingStorage:
             if guild_id not in self.data:
                 self.data[guild_id] = {}
             self.data[guild_id][user_id] = data
+            self._reindex_user(guild_id, user_id, data.get('xp', 0))
+            self._mark_guild_dirty(guild_id)
     
     async def get_guild_leaderboard(self, guild_id: str, limit: int = 10):
         """Get guild leaderboard."""
@@ -98,8 +183,32 @@ class LevelingStorage:
                                      sort=[('xp', -1)])
         else:
             guild_data = self.data.get(guild_id, {})
-            sorted_users = sorted(guild_data.items(), key=lambda x: x[1].get('xp', 0), reverse=True)
-            return [{'user_id': uid, **data} for uid, data in sorted_users[:limit]]
+            index = self._get_xp_index(guild_id)
+            top_users = index[-1:-limit - 1:-1] if limit > 0 else []
+            return [{'user_id': uid, **guild_data[uid]} for _, uid in top_users]
+    
+    def _get_xp_index(self, guild_id: str) -> SortedList:
+        """Return the guild's XP index, building it on first use."""
+        index = self._xp_index.get(guild_id)
+        if index is None:
+            xp_by_user = {uid: data.get('xp', 0) for uid, data in self.data.get(guild_id, {}).items()}
+            index = SortedList((xp, uid) for uid, xp in xp_by_user.items())
+            self._xp_index[guild_id] = index
+            self._indexed_xp[guild_id] = xp_by_user
+        return index
+    
+    def _reindex_user(self, guild_id: str, user_id: str, xp: Optional[int]):
+        """Move (or with xp=None, drop) a user in the guild's XP index, if one has been built."""
+        index = self._xp_index.get(guild_id)
+        if index is None:
+            return
+        xp_by_user = self._indexed_xp[guild_id]
+        old_xp = xp_by_user.pop(user_id, None)
+        if old_xp is not None:
+            index.discard((old_xp, user_id))
+        if xp is not None:
+            index.add((xp, user_id))
+            xp_by_user[user_id] = xp
     
     async def delete_user_data(self, guild_id: str, user_id: str):
         """Delete user data."""
@@ -109,6 +218,8 @@ class LevelingStorage:
         else:
             if guild_id in self.data and user_id in self.data[guild_id]:
                 del self.data[guild_id][user_id]
+                self._reindex_user(guild_id, user_id, None)
+                self._mark_guild_dirty(guild_id)
     
     async def get_settings(self, guild_id: str) -> Dict[str, Any]:
         """Get guild settings."""
@@ -127,6 +238,7 @@ class LevelingStorage:
             await db.update_one('leveling_settings', {'guild_id': guild_id}, settings, upsert=True)
         else:
             self.settings[guild_id] = settings
+            self._mark_dirty('settings')
     
     async def get_roles(self, guild_id: str) -> Dict[str, Any]:
         """Get level roles."""
@@ -145,6 +257,7 @@ class LevelingStorage:
                               {'guild_id': guild_id, 'roles': roles}, upsert=True)
         else:
             self.roles[guild_id] = roles
+            self._mark_dirty('roles')
     
     async def get_messages(self, guild_id: str) -> Dict[str, Any]:
         """Get level messages."""
@@ -163,6 +276,7 @@ class LevelingStorage:
                               {'guild_id': guild_id, 'messages': messages}, upsert=True)
         else:
             self.messages[guild_id] = messages
+            self._mark_dirty('messages')
     
     async def get_background(self, user_id: str) -> Optional[str]:
         """Get user background URL."""
@@ -181,6 +295,7 @@ class LevelingStorage:
                               {'user_id': user_id, 'url': url}, upsert=True)
         else:
             self.backgrounds[user_id] = url
+            self._mark_dirty('backgrounds')
     
     async def delete_background(self, user_id: str):
         """Delete user background."""
@@ -190,3 +305,4 @@ class LevelingStorage:
         else:
             if user_id in self.backgrounds:
                 del self.backgrounds[user_id]
+                self._mark_dirty('backgrounds')
@@ -2,14 +2,47 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import asyncio
+import heapq
+import itertools
+import re
+import time
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
 import config
+from moderation_storage import ModerationStorage
+
+_DURATION_RE = re.compile(r"(\d+)([a-z])")
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+_BAN_COLOR = discord.Color.red()
+_KICK_COLOR = discord.Color.orange()
+_MUTE_COLOR = discord.Color.gold()
+_WARN_COLOR = discord.Color.yellow()
+
+def _mod_embed(title, description, color, fields, footer):
+    """Build a moderation action embed from (name, value) field pairs"""
+    embed = discord.Embed(title=title, description=description, color=color)
+    for name, value in fields:
+        embed.add_field(name=name, value=value)
+    if footer:
+        embed.set_footer(text=footer)
+    return embed
 
 class Moderation(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.warnings = {}  # {guild_id: {user_id: [warnings]}}
-        self.muted_users = {}  # {guild_id: {user_id: unmute_time}}
+        
+        # Initialize storage abstraction layer; the dicts below are caches over it
+        self.storage = ModerationStorage()
+        
+        # {(guild.id, member.id): deque[warning]}, least recently used first. Only used with MongoDB;
+        # in JSON mode the storage layer already holds every warning in memory.
+        self.warnings = OrderedDict()
+        self.muted_users = {}  # {guild.id: {member.id: unmute deadline on the time.monotonic() clock}}
+        self._expiry_heap = []  # [(deadline, guild_id, user_id)], may hold stale entries
+        self._wakeup = asyncio.Event()  # Set when a new mute may expire before the current wait ends
+        self._notify_channels = {}  # {guild.id: channel} where unmute notices are posted
+        self._mute_roles = {}  # {guild.id: role.id} of the role named config.MUTE_ROLE_NAME
         self._mute_task = None
     
     async def cog_load(self):
@@ -22,44 +55,190 @@ class Moderation(commands.Cog):
             self._mute_task.cancel()
     
     async def check_mute_expiry(self):
-        """Check for expired mutes and unmute users"""
+        """Sleep until the next mute expires, then unmute everyone who is due"""
         await self.bot.wait_until_ready()
+        await self.restore_mutes()
         while not self.bot.is_closed():
-            current_time = datetime.now()
-            for guild_id in list(self.muted_users.keys()):
-                guild = self.bot.get_guild(int(guild_id))
-                if not guild:
-                    continue
-                    
-                # Get the mute role
-                mute_role = discord.utils.get(guild.roles, name=config.MUTE_ROLE_NAME)
-                if not mute_role:
-                    continue
-                    
-                for user_id, unmute_time in list(self.muted_users[guild_id].items()):
-                    if current_time >= unmute_time:
-                        member = guild.get_member(int(user_id))
-                        if member and mute_role in member.roles:
-                            try:
-                                await member.remove_roles(mute_role)
-                                del self.muted_users[guild_id][user_id]
-                                
-                                # Send notification
-                                for channel in guild.text_channels:
-                                    if channel.permissions_for(guild.me).send_messages:
-                                        await channel.send(f"{member.mention} has been unmuted.")
-                                        break
-                            except discord.Forbidden:
-                                print(f"Failed to unmute {member} in {guild}: Missing permissions")
-                            except Exception as e:
-                                print(f"Error unmuting {member} in {guild}: {e}")
+            due = []
+            while self._expiry_heap and self._expiry_heap[0][0] <= time.monotonic():
+                deadline, guild_id, user_id = heapq.heappop(self._expiry_heap)
+                # Skip entries for mutes that were lifted or replaced since they were pushed
+                if self.muted_users.get(guild_id, {}).get(user_id) == deadline:
+                    due.append((guild_id, user_id))
+            if due:
+                # Each unmute is independent REST traffic, so don't queue them behind one another
+                results = await asyncio.gather(
+                    *(self.expire_mute(guild_id, user_id) for guild_id, user_id in due),
+                    return_exceptions=True
+                )
+                for error in results:
+                    if isinstance(error, Exception):
+                        print(f"Error expiring mute: {error}")
             
-            # Check every 30 seconds
-            await asyncio.sleep(30)
+            self._wakeup.clear()
+            timeout = None
+            if self._expiry_heap:
+                timeout = max(0, self._expiry_heap[0][0] - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def restore_mutes(self):
+        """Resume mutes that were active when the bot last stopped"""
+        # MongoDB connects in on_ready, which can still be running when wait_until_ready returns
+        for _ in range(60):
+            if self.storage.is_ready():
+                break
+            await asyncio.sleep(1)
+        else:
+            print("Storage not ready after 60s; stored mutes were not resumed")
+            return
+        for guild_id, user_id, unmute_at in await self.storage.get_mutes():
+            self.schedule_unmute(int(guild_id), int(user_id), unmute_at - time.time())
+    
+    def schedule_unmute(self, guild_id: int, user_id: int, duration_seconds: float):
+        """Record a mute and wake the expiry loop in case it now expires first"""
+        # Monotonic deadlines can't be moved by NTP or DST adjustments to the wall clock
+        deadline = time.monotonic() + duration_seconds
+        if guild_id not in self.muted_users:
+            self.muted_users[guild_id] = {}
+        self.muted_users[guild_id][user_id] = deadline
+        heapq.heappush(self._expiry_heap, (deadline, guild_id, user_id))
+        self._wakeup.set()
+    
+    async def expire_mute(self, guild_id: int, user_id: int):
+        """Remove the mute role from a member whose mute has run out"""
+        guild = self.bot.get_guild(guild_id)
+        mute_role = self.get_mute_role(guild) if guild else None
+        member = guild.get_member(user_id) if guild else None
+        if not mute_role or not member or mute_role not in member.roles:
+            # Nothing left to undo
+            await self.clear_mute(guild_id, user_id)
+            return
+        
+        try:
+            await member.remove_roles(mute_role)
+            await self.clear_mute(guild_id, user_id)
+            
+            # Send notification
+            channel = self.get_notify_channel(guild)
+            if channel:
+                try:
+                    await channel.send(f"{member.mention} has been unmuted.")
+                except discord.Forbidden:
+                    self._notify_channels.pop(guild.id, None)
+        except discord.Forbidden:
+            print(f"Failed to unmute {member} in {guild}: Missing permissions")
+        except Exception as e:
+            print(f"Error unmuting {member} in {guild}: {e}")
+        
+        if user_id in self.muted_users.get(guild_id, {}):
+            # Failed to unmute; try again later
+            self.schedule_unmute(guild_id, user_id, 30)
+    
+    async def clear_mute(self, guild_id: int, user_id: int):
+        """Forget a mute, both in memory and in storage"""
+        guild_mutes = self.muted_users.get(guild_id, {})
+        guild_mutes.pop(user_id, None)
+        if not guild_mutes:
+            self.muted_users.pop(guild_id, None)
+        if not self.muted_users and self._expiry_heap:
+            # Only stale entries are left; drop them so the expiry task sleeps until the next mute
+            self._expiry_heap.clear()
+            self._wakeup.set()
+        await self.storage.delete_mute(str(guild_id), str(user_id))
+    
+    async def get_warnings(self, key):
+        """Return the warnings for a (guild.id, member.id) key, loading them from storage on a cache miss"""
+        user_warnings = self.warnings.get(key)
+        if user_warnings is not None:
+            self.warnings.move_to_end(key)
+            return user_warnings
+        
+        guild_id, user_id = key
+        # Only the most recent MAX_WARNINGS_PER_USER are kept
+        user_warnings = deque(
+            await self.storage.get_warnings(str(guild_id), str(user_id)),
+            maxlen=config.MAX_WARNINGS_PER_USER
+        )
+        if not self.storage.use_db:
+            return user_warnings
+        self.warnings[key] = user_warnings
+        if len(self.warnings) > config.MAX_WARNING_BUCKETS:
+            # Evicted warnings stay in storage and are reloaded on the next lookup
+            self.warnings.popitem(last=False)
+        return user_warnings
+    
+    def get_notify_channel(self, guild):
+        """Return the channel for unmute notices, scanning the guild's channels only on a cache miss"""
+        channel = self._notify_channels.get(guild.id)
+        if channel and guild.get_channel(channel.id) and channel.permissions_for(guild.me).send_messages:
+            return channel
+        
+        channel = None
+        if guild.system_channel and guild.system_channel.permissions_for(guild.me).send_messages:
+            channel = guild.system_channel
+        else:
+            channel = next(
+                (c for c in guild.text_channels if c.permissions_for(guild.me).send_messages),
+                None
+            )
+        if channel:
+            self._notify_channels[guild.id] = channel
+        else:
+            self._notify_channels.pop(guild.id, None)
+        return channel
+    
+    def check_hierarchy(self, actor, target) -> bool:
+        """Whether actor's top role is strictly above target's"""
+        return actor.top_role > target.top_role
+    
+    def get_mute_role(self, guild):
+        """Return the guild's mute role, scanning its roles only on a cache miss"""
+        role_id = self._mute_roles.get(guild.id)
+        mute_role = guild.get_role(role_id) if role_id else None
+        if mute_role is None:
+            mute_role = discord.utils.get(guild.roles, name=config.MUTE_ROLE_NAME)
+            if mute_role:
+                self._mute_roles[guild.id] = mute_role.id
+        return mute_role
+    
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        if self._mute_roles.get(role.guild.id) == role.id:
+            del self._mute_roles[role.guild.id]
+    
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        # A renamed mute role no longer counts as the mute role
+        if before.name != after.name and self._mute_roles.get(after.guild.id) == after.id:
+            del self._mute_roles[after.guild.id]
+    
+    async def apply_mute_overwrites(self, guild, mute_role):
+        """Deny the mute role speech in every channel, skipping channels that already deny it"""
+        pending = []
+        for channel in guild.channels:
+            overwrite = channel.overwrites_for(mute_role)
+            if overwrite.send_messages is False and overwrite.add_reactions is False and overwrite.speak is False:
+                continue
+            pending.append(channel.set_permissions(
+                mute_role,
+                send_messages=False,
+                add_reactions=False,
+                speak=False,
+                reason="Role for muted users"
+            ))
+        
+        # One failed channel shouldn't leave the rest unconfigured
+        results = await asyncio.gather(*pending, return_exceptions=True)
+        failed = sum(isinstance(result, Exception) for result in results)
+        if failed:
+            print(f"Failed to set mute permissions in {failed} channels of {guild}")
     
     async def create_mute_role(self, guild):
         """Create a mute role if it doesn't exist"""
-        mute_role = discord.utils.get(guild.roles, name=config.MUTE_ROLE_NAME)
+        mute_role = self.get_mute_role(guild)
         if not mute_role:
             try:
                 # Create the mute role
@@ -67,16 +246,8 @@ class Moderation(commands.Cog):
                     name=config.MUTE_ROLE_NAME,
                     reason="Role for muted users"
                 )
-                
-                # Set permissions for all channels
-                for channel in guild.channels:
-                    await channel.set_permissions(
-                        mute_role,
-                        send_messages=False,
-                        add_reactions=False,
-                        speak=False
-                    )
-                
+                self._mute_roles[guild.id] = mute_role.id
+                await self.apply_mute_overwrites(guild, mute_role)
                 return mute_role
             except discord.Forbidden:
                 return None
@@ -87,19 +258,16 @@ class Moderation(commands.Cog):
     @app_commands.checks.has_permissions(ban_members=True)
     async def ban(self, interaction: discord.Interaction, member: discord.Member, reason: str = "No reason provided"):
         """Ban a member from the server"""
-        if interaction.user.top_role <= member.top_role:
+        if not self.check_hierarchy(interaction.user, member):
             await interaction.response.send_message("You cannot ban someone with a higher or equal role.", ephemeral=True)
             return
             
         try:
             await member.ban(reason=reason)
-            embed = discord.Embed(
-                title="Member Banned",
-                description=f"{member.mention} has been banned.",
-                color=discord.Color.red()
+            embed = _mod_embed(
+                "Member Banned", f"{member.mention} has been banned.", _BAN_COLOR,
+                [("Reason", reason)], f"Banned by {interaction.user}"
             )
-            embed.add_field(name="Reason", value=reason)
-            embed.set_footer(text=f"Banned by {interaction.user}")
             await interaction.response.send_message(embed=embed)
         except discord.Forbidden:
             await interaction.response.send_message("I don't have permission to ban members.", ephemeral=True)
@@ -111,19 +279,16 @@ class Moderation(commands.Cog):
     @app_commands.checks.has_permissions(kick_members=True)
     async def kick(self, interaction: discord.Interaction, member: discord.Member, reason: str = "No reason provided"):
         """Kick a member from the server"""
-        if interaction.user.top_role <= member.top_role:
+        if not self.check_hierarchy(interaction.user, member):
             await interaction.response.send_message("You cannot kick someone with a higher or equal role.", ephemeral=True)
             return
             
         try:
             await member.kick(reason=reason)
-            embed = discord.Embed(
-                title="Member Kicked",
-                description=f"{member.mention} has been kicked.",
-                color=discord.Color.orange()
+            embed = _mod_embed(
+                "Member Kicked", f"{member.mention} has been kicked.", _KICK_COLOR,
+                [("Reason", reason)], f"Kicked by {interaction.user}"
             )
-            embed.add_field(name="Reason", value=reason)
-            embed.set_footer(text=f"Kicked by {interaction.user}")
             await interaction.response.send_message(embed=embed)
         except discord.Forbidden:
             await interaction.response.send_message("I don't have permission to kick members.", ephemeral=True)
@@ -139,30 +304,20 @@ class Moderation(commands.Cog):
     @app_commands.checks.has_permissions(manage_roles=True)
     async def mute(self, interaction: discord.Interaction, member: discord.Member, duration: str = "1h", reason: str = "No reason provided"):
         """Mute a member for a specified duration"""
-        if interaction.user.top_role <= member.top_role:
+        if not self.check_hierarchy(interaction.user, member):
             await interaction.response.send_message("You cannot mute someone with a higher or equal role.", ephemeral=True)
             return
             
         # Parse duration
-        duration_seconds = config.DEFAULT_MUTE_DURATION
-        try:
-            time_unit = duration[-1].lower()
-            time_value = int(duration[:-1])
-            
-            if time_unit == 's':
-                duration_seconds = time_value
-            elif time_unit == 'm':
-                duration_seconds = time_value * 60
-            elif time_unit == 'h':
-                duration_seconds = time_value * 3600
-            elif time_unit == 'd':
-                duration_seconds = time_value * 86400
-            else:
-                await interaction.response.send_message("Invalid time unit. Use s (seconds), m (minutes), h (hours), or d (days).", ephemeral=True)
-                return
-        except ValueError:
+        match = _DURATION_RE.fullmatch(duration.strip().lower())
+        if not match:
             await interaction.response.send_message("Invalid duration format. Use a number followed by s, m, h, or d (e.g., 30m, 2h).", ephemeral=True)
             return
+        unit_seconds = _DURATION_UNITS.get(match.group(2))
+        if unit_seconds is None:
+            await interaction.response.send_message("Invalid time unit. Use s (seconds), m (minutes), h (hours), or d (days).", ephemeral=True)
+            return
+        duration_seconds = int(match.group(1)) * unit_seconds
             
         # Get or create mute role
         mute_role = await self.create_mute_role(interaction.guild)
@@ -174,28 +329,23 @@ class Moderation(commands.Cog):
             # Add role to member
             await member.add_roles(mute_role, reason=reason)
             
-            # Calculate unmute time
-            unmute_time = datetime.now() + timedelta(seconds=duration_seconds)
-            
             # Store mute information
-            guild_id = str(interaction.guild.id)
-            user_id = str(member.id)
+            self.schedule_unmute(interaction.guild.id, member.id, duration_seconds)
+            await self.storage.set_mute(str(interaction.guild.id), str(member.id), time.time() + duration_seconds)
             
-            if guild_id not in self.muted_users:
-                self.muted_users[guild_id] = {}
-                
-            self.muted_users[guild_id][user_id] = unmute_time
+            # Wall-clock unmute time, for display only
+            unmute_time = datetime.now() + timedelta(seconds=duration_seconds)
             
             # Create embed
-            embed = discord.Embed(
-                title="Member Muted",
-                description=f"{member.mention} has been muted.",
-                color=discord.Color.gold()
+            embed = _mod_embed(
+                "Member Muted", f"{member.mention} has been muted.", _MUTE_COLOR,
+                [
+                    ("Reason", reason),
+                    ("Duration", duration),
+                    ("Unmute Time", unmute_time.strftime("%Y-%m-%d %H:%M:%S")),
+                ],
+                f"Muted by {interaction.user}"
             )
-            embed.add_field(name="Reason", value=reason)
-            embed.add_field(name="Duration", value=duration)
-            embed.add_field(name="Unmute Time", value=unmute_time.strftime("%Y-%m-%d %H:%M:%S"))
-            embed.set_footer(text=f"Muted by {interaction.user}")
             
             await interaction.response.send_message(embed=embed)
             
@@ -209,7 +359,7 @@ class Moderation(commands.Cog):
     @app_commands.checks.has_permissions(manage_roles=True)
     async def unmute(self, interaction: discord.Interaction, member: discord.Member):
         """Unmute a muted member"""
-        mute_role = discord.utils.get(interaction.guild.roles, name=config.MUTE_ROLE_NAME)
+        mute_role = self.get_mute_role(interaction.guild)
         if not mute_role:
             await interaction.response.send_message("Mute role not found.", ephemeral=True)
             return
@@ -222,11 +372,7 @@ class Moderation(commands.Cog):
             await member.remove_roles(mute_role)
             
             # Remove from muted users
-            guild_id = str(interaction.guild.id)
-            user_id = str(member.id)
-            
-            if guild_id in self.muted_users and user_id in self.muted_users[guild_id]:
-                del self.muted_users[guild_id][user_id]
+            await self.clear_mute(interaction.guild.id, member.id)
             
             await interaction.response.send_message(f"{member.mention} has been unmuted.")
         except discord.Forbidden:
@@ -239,48 +385,35 @@ class Moderation(commands.Cog):
     @app_commands.checks.has_permissions(manage_messages=True)
     async def warn(self, interaction: discord.Interaction, member: discord.Member, reason: str = "No reason provided"):
         """Warn a member"""
-        if interaction.user.top_role <= member.top_role:
+        if not self.check_hierarchy(interaction.user, member):
             await interaction.response.send_message("You cannot warn someone with a higher or equal role.", ephemeral=True)
             return
             
-        guild_id = str(interaction.guild.id)
-        user_id = str(member.id)
-        
-        if guild_id not in self.warnings:
-            self.warnings[guild_id] = {}
-            
-        if user_id not in self.warnings[guild_id]:
-            self.warnings[guild_id][user_id] = []
-            
+        user_warnings = await self.get_warnings((interaction.guild.id, member.id))
         warning = {
             "reason": reason,
-            "timestamp": datetime.now(),
+            "timestamp": datetime.now().isoformat(),
             "moderator": interaction.user.id
         }
         
-        self.warnings[guild_id][user_id].append(warning)
+        user_warnings.append(warning)
+        await self.storage.set_warnings(str(interaction.guild.id), str(member.id), list(user_warnings))
         
         # Create embed
-        embed = discord.Embed(
-            title="Member Warned",
-            description=f"{member.mention} has been warned.",
-            color=discord.Color.yellow()
+        warning_fields = [("Reason", reason), ("Warning Count", len(user_warnings))]
+        embed = _mod_embed(
+            "Member Warned", f"{member.mention} has been warned.", _WARN_COLOR,
+            warning_fields, f"Warned by {interaction.user}"
         )
-        embed.add_field(name="Reason", value=reason)
-        embed.add_field(name="Warning Count", value=len(self.warnings[guild_id][user_id]))
-        embed.set_footer(text=f"Warned by {interaction.user}")
         
         await interaction.response.send_message(embed=embed)
         
         # DM the user
         try:
-            dm_embed = discord.Embed(
-                title=f"Warning in {interaction.guild.name}",
-                description=f"You have been warned.",
-                color=discord.Color.yellow()
+            dm_embed = _mod_embed(
+                f"Warning in {interaction.guild.name}", "You have been warned.", _WARN_COLOR,
+                warning_fields, None
             )
-            dm_embed.add_field(name="Reason", value=reason)
-            dm_embed.add_field(name="Warning Count", value=len(self.warnings[guild_id][user_id]))
             
             await member.send(embed=dm_embed)
         except:
@@ -291,27 +424,27 @@ class Moderation(commands.Cog):
     @app_commands.checks.has_permissions(manage_messages=True)
     async def warnings(self, interaction: discord.Interaction, member: discord.Member):
         """Show warnings for a member"""
-        guild_id = str(interaction.guild.id)
-        user_id = str(member.id)
-        
-        if guild_id not in self.warnings or user_id not in self.warnings[guild_id] or not self.warnings[guild_id][user_id]:
+        user_warnings = await self.get_warnings((interaction.guild.id, member.id))
+        if not user_warnings:
             await interaction.response.send_message(f"{member.mention} has no warnings.", ephemeral=True)
             return
             
         embed = discord.Embed(
             title=f"Warnings for {member}",
-            description=f"{member.mention} has {len(self.warnings[guild_id][user_id])} warnings.",
-            color=discord.Color.yellow()
+            description=f"{member.mention} has {len(user_warnings)} warnings.",
+            color=_WARN_COLOR
         )
         
-        for i, warning in enumerate(self.warnings[guild_id][user_id], 1):
+        # Embeds hold at most 25 fields; show the most recent ones, numbered by their position overall
+        first_shown = max(0, len(user_warnings) - 25)
+        for i, warning in enumerate(itertools.islice(user_warnings, first_shown, None), first_shown + 1):
             moderator = interaction.guild.get_member(warning["moderator"])
             moderator_name = moderator.name if moderator else "Unknown Moderator"
             
             embed.add_field(
                 name=f"Warning {i}",
                 value=f"**Reason:** {warning['reason']}\n"
-                      f"**Date:** {warning['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}\n"
+                      f"**Date:** {datetime.fromisoformat(warning['timestamp']).strftime('%Y-%m-%d %H:%M:%S')}\n"
                       f"**Moderator:** {moderator_name}",
                 inline=False
             )
@@ -323,15 +456,15 @@ class Moderation(commands.Cog):
     @app_commands.checks.has_permissions(manage_messages=True)
     async def clearwarnings(self, interaction: discord.Interaction, member: discord.Member):
         """Clear all warnings for a member"""
-        guild_id = str(interaction.guild.id)
-        user_id = str(member.id)
-        
-        if guild_id not in self.warnings or user_id not in self.warnings[guild_id] or not self.warnings[guild_id][user_id]:
+        key = (interaction.guild.id, member.id)
+        user_warnings = await self.get_warnings(key)
+        if not user_warnings:
             await interaction.response.send_message(f"{member.mention} has no warnings to clear.", ephemeral=True)
             return
             
-        warning_count = len(self.warnings[guild_id][user_id])
-        self.warnings[guild_id][user_id] = []
+        warning_count = len(user_warnings)
+        self.warnings.pop(key, None)
+        await self.storage.delete_warnings(str(interaction.guild.id), str(member.id))
         
         await interaction.response.send_message(f"Cleared {warning_count} warnings for {member.mention}")
     
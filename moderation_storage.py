@@ -0,0 +1,118 @@
+"""
+Storage abstraction layer for moderation data (warnings and active mutes).
+Supports both MongoDB and JSON file storage with automatic fallback.
+"""
+import asyncio
+import os
+import logging
+from typing import Dict, List, Any, Tuple
+import config
+from jsonio import json_loads, json_dumps, write_file_atomic
+
+logger = logging.getLogger("bot")
+
+class ModerationStorage:
+    """Hybrid storage for moderation data - MongoDB or JSON fallback."""
+
+    def __init__(self):
+        self.use_db = config.USE_MONGODB
+        self.json_file = 'moderation.json'
+        self.warnings = {}  # guild_id -> user_id -> [warning]
+        self.mutes = {}  # guild_id -> user_id -> unmute time as a Unix timestamp
+
+        if not self.use_db:
+            self._load_json()
+
+    def is_ready(self) -> bool:
+        """Whether reads reach the backing store (MongoDB connects only once the bot is ready)."""
+        if self.use_db:
+            from database import db
+            return db.is_connected
+        return True
+
+    def _load_json(self):
+        """Load data from JSON file."""
+        try:
+            if os.path.exists(self.json_file):
+                with open(self.json_file, 'rb') as f:
+                    data = json_loads(f.read())
+                self.warnings = data.get('warnings', {})
+                self.mutes = data.get('mutes', {})
+        except Exception as e:
+            logger.error(f"Error loading moderation JSON data: {e}")
+
+    async def save_json(self):
+        """Save data to JSON file."""
+        if self.use_db:
+            return  # Don't save to JSON if using MongoDB
+        try:
+            content = json_dumps({'warnings': self.warnings, 'mutes': self.mutes}, indent=True)
+            await asyncio.to_thread(write_file_atomic, self.json_file, content)
+        except Exception as e:
+            logger.error(f"Error saving moderation JSON data: {e}")
+
+    async def get_warnings(self, guild_id: str, user_id: str) -> List[Dict[str, Any]]:
+        """Get a member's warnings, oldest first."""
+        if self.use_db:
+            from database import db
+            result = await db.find_one('warnings', {'guild_id': guild_id, 'user_id': user_id})
+            return result.get('warnings', []) if result else []
+        else:
+            return list(self.warnings.get(guild_id, {}).get(user_id, []))
+
+    async def set_warnings(self, guild_id: str, user_id: str, warnings: List[Dict[str, Any]]):
+        """Replace a member's warnings."""
+        if self.use_db:
+            from database import db
+            await db.update_one('warnings', {'guild_id': guild_id, 'user_id': user_id},
+                              {'guild_id': guild_id, 'user_id': user_id, 'warnings': warnings}, upsert=True)
+        else:
+            if guild_id not in self.warnings:
+                self.warnings[guild_id] = {}
+            self.warnings[guild_id][user_id] = list(warnings)
+            await self.save_json()
+
+    async def delete_warnings(self, guild_id: str, user_id: str):
+        """Delete all of a member's warnings."""
+        if self.use_db:
+            from database import db
+            await db.delete_one('warnings', {'guild_id': guild_id, 'user_id': user_id})
+        else:
+            if guild_id in self.warnings and user_id in self.warnings[guild_id]:
+                del self.warnings[guild_id][user_id]
+                await self.save_json()
+
+    async def get_mutes(self) -> List[Tuple[str, str, float]]:
+        """Get every active mute as (guild_id, user_id, unmute_at)."""
+        if self.use_db:
+            from database import db
+            results = await db.find_many('mutes')
+            return [(doc['guild_id'], doc['user_id'], doc['unmute_at']) for doc in results]
+        else:
+            return [
+                (guild_id, user_id, unmute_at)
+                for guild_id, guild_mutes in self.mutes.items()
+                for user_id, unmute_at in guild_mutes.items()
+            ]
+
+    async def set_mute(self, guild_id: str, user_id: str, unmute_at: float):
+        """Record an active mute."""
+        if self.use_db:
+            from database import db
+            await db.update_one('mutes', {'guild_id': guild_id, 'user_id': user_id},
+                              {'guild_id': guild_id, 'user_id': user_id, 'unmute_at': unmute_at}, upsert=True)
+        else:
+            if guild_id not in self.mutes:
+                self.mutes[guild_id] = {}
+            self.mutes[guild_id][user_id] = unmute_at
+            await self.save_json()
+
+    async def delete_mute(self, guild_id: str, user_id: str):
+        """Remove an active mute."""
+        if self.use_db:
+            from database import db
+            await db.delete_one('mutes', {'guild_id': guild_id, 'user_id': user_id})
+        else:
+            if guild_id in self.mutes and user_id in self.mutes[guild_id]:
+                del self.mutes[guild_id][user_id]
+                await self.save_json()
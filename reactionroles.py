@@ -3,13 +3,43 @@ from discord.ext import commands, tasks
 from discord import app_commands
 import json
 import os
+import hashlib
 import asyncio
-from typing import Dict, List, Optional, Union, Literal
+import re
+from typing import Dict, List, NamedTuple, Optional, Union, Literal
 import logging
 import io
+from concurrent.futures import ThreadPoolExecutor
+from jsonio import json_loads, json_dumps, read_json_file, write_file_atomic
 
 logger = logging.getLogger("bot")
 
+# Custom emoji markup: <:name:id>, or <a:name:id> when animated
+_CUSTOM_EMOJI_RE = re.compile(r'<(a?):([^:>]+):(\d+)>')
+
+class _RoleEntry(NamedTuple):
+    """A reaction role as the listeners see it: a tuple, so no per-entry dict"""
+    role_id: int
+    mode: str
+
+def _emoji_key(emoji) -> str:
+    """Normalize a stored emoji string or a PartialEmoji: name:id for custom emoji, the character otherwise"""
+    if isinstance(emoji, str):
+        match = _CUSTOM_EMOJI_RE.fullmatch(emoji)
+        return f"{match.group(2)}:{match.group(3)}" if match else emoji
+    return f"{emoji.name}:{emoji.id}" if emoji.id else emoji.name
+
+def _write_shard(path: str, content: Optional[bytes], saved_digest: Optional[bytes]) -> Optional[bytes]:
+    """Write a guild shard unless it is unchanged since saved_digest, and return its digest. None content removes it."""
+    if content is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    digest = hashlib.blake2b(content, digest_size=16).digest()
+    if digest != saved_digest:
+        write_file_atomic(path, content)
+    return digest
+
 # Data structure for reaction roles:
 # {
 #   guild_id: {
@@ -32,59 +62,200 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
     def __init__(self, bot):
         self.bot = bot
         self.reaction_roles = {}  # Guild ID -> Message ID -> Emoji -> Role ID
-        self.data_file = 'reaction_roles.json'
-        self.load_data()
+        self.data_file = 'reaction_roles.json'  # legacy single file, split into data_dir on first save
+        self.data_dir = 'reaction_roles'  # one {guild_id}.json per guild
+        os.makedirs(self.data_dir, exist_ok=True)
+        # Guilds with unsaved changes, and digests of the shards on disk so saves that change nothing
+        # skip the write. mark_dirty sets _save_event; the save worker then waits save_delay seconds
+        # so a burst of commands is written once.
+        self._dirty_guilds = set()
+        self._saved_digests = {}  # guild_id -> digest
+        # Guilds from the legacy data_file that have no shard yet; the file is kept until this empties
+        self._legacy_guilds = set()
+        self._legacy_file_pending = False
+        self._save_event = asyncio.Event()
+        self._save_worker_task: Optional[asyncio.Task] = None
+        self.save_delay = 2.0
+        # One dedicated writer thread: shard writes stay off the loop and land in the order they were queued
+        self._io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rr-io")
+        # Int-keyed views of reaction_roles for the reaction listeners, so they can use payload
+        # IDs directly. The stored data keeps string keys because that is what JSON round-trips.
+        self._message_index = {}  # message ID -> that message's data dict
+        self._role_index = {}  # message ID -> _emoji_key(emoji) -> _RoleEntry
+        self._indexed_messages = {}  # guild ID -> message IDs it has in the indexes
+        self._list_embed_cache: Dict[str, discord.Embed] = {}  # guild_id -> rendered /reaction list embed
         self.save_task.start()
-        # Register persistent button view handlers
-        bot.loop.create_task(self.register_persistent_views())
         super().__init__()
         
-    def cog_unload(self):
+    async def cog_load(self):
+        # Listeners are attached only after cog_load returns, so nothing reads the data while
+        # it loads in a thread, and every persistent view exists before the first interaction
+        await asyncio.to_thread(self.load_data)
+        await self.register_persistent_views()
+        self._save_worker_task = asyncio.create_task(self._save_worker())
+        
+    async def cog_unload(self):
         self.save_task.cancel()
+        if self._save_worker_task:
+            self._save_worker_task.cancel()
+        # Write anything still pending; queued writes run to completion
+        await self.save_data()
+        self._io_executor.shutdown(wait=False)
         
     def load_data(self):
         """Load reaction role data from file"""
         try:
+            shards = [entry for entry in os.scandir(self.data_dir) if entry.name.endswith('.json')]
+            for entry in shards:
+                guild_id = entry.name[:-len('.json')]
+                self.reaction_roles[guild_id], self._saved_digests[guild_id] = read_json_file(entry.path)
             if os.path.exists(self.data_file):
-                with open(self.data_file, 'r') as f:
-                    self.reaction_roles = json.load(f)
-                # Migrate legacy entries to unified schema
-                for guild_id, guild_data in list(self.reaction_roles.items()):
-                    if not isinstance(guild_data, dict):
+                # A split that stopped partway leaves both; shards are newer for the guilds they cover
+                legacy, _ = read_json_file(self.data_file)
+                self._legacy_guilds = set(legacy) - set(self.reaction_roles)
+                for guild_id in self._legacy_guilds:
+                    self.reaction_roles[guild_id] = legacy[guild_id]
+                # Split the rest into per-guild shards on the next save
+                self._dirty_guilds.update(self._legacy_guilds)
+                self._legacy_file_pending = True
+            # Migrate legacy entries to unified schema
+            for guild_id, guild_data in list(self.reaction_roles.items()):
+                if not isinstance(guild_data, dict):
+                    continue
+                for message_id, message_data in list(guild_data.items()):
+                    if not isinstance(message_data, dict):
                         continue
-                    for message_id, message_data in list(guild_data.items()):
-                        if not isinstance(message_data, dict):
+                    for emoji, value in list(message_data.items()):
+                        if emoji == "settings":
                             continue
-                        for emoji, value in list(message_data.items()):
-                            if emoji == "settings":
-                                continue
-                            # If stored as plain role id, convert
-                            if isinstance(value, (int, str)):
-                                message_data[emoji] = {
-                                    "role_id": str(value),
-                                    "mode": "normal",
-                                    "label": None
-                                }
-                            elif isinstance(value, dict):
-                                # Ensure required keys exist
-                                if "role_id" in value:
-                                    value.setdefault("mode", "normal")
-                                    value.setdefault("label", None)
+                        # If stored as plain role id, convert
+                        if isinstance(value, (int, str)):
+                            message_data[emoji] = {
+                                "role_id": str(value),
+                                "mode": "normal",
+                                "label": None
+                            }
+                            self._dirty_guilds.add(guild_id)
+                        elif isinstance(value, dict):
+                            # Ensure required keys exist
+                            if "role_id" in value and not ("mode" in value and "label" in value):
+                                value.setdefault("mode", "normal")
+                                value.setdefault("label", None)
+                                self._dirty_guilds.add(guild_id)
         except Exception as e:
             logger.error(f"Error loading reaction role data: {e}")
-            
-    async def save_data(self):
-        """Save reaction role data to file"""
+        for guild_id in self.reaction_roles:
+            self._index_guild(guild_id)
+    
+    def _index_guild(self, guild_id: str):
+        """Rebuild a guild's entries in the message and role indexes"""
+        for message_id in self._indexed_messages.pop(int(guild_id), ()):
+            self._message_index.pop(message_id, None)
+            self._role_index.pop(message_id, None)
+        guild_data = self.reaction_roles.get(guild_id)
+        if not isinstance(guild_data, dict):
+            return
+        message_ids = set()
+        for message_id, message_data in guild_data.items():
+            if isinstance(message_data, dict) and message_id.isdigit():
+                self._message_index[int(message_id)] = message_data
+                # Stored keys keep the <:name:id> markup buttons need; reactions arrive as PartialEmoji,
+                # so index both under the same normalized key
+                self._role_index[int(message_id)] = {
+                    _emoji_key(emoji): _RoleEntry(int(role_data["role_id"]), role_data.get("mode", "normal"))
+                    for emoji, role_data in message_data.items()
+                    if emoji != "settings" and isinstance(role_data, dict)
+                    and str(role_data.get("role_id", "")).isdigit()
+                }
+                message_ids.add(int(message_id))
+        self._indexed_messages[int(guild_id)] = message_ids
+            
+    def mark_dirty(self, guild_id: str):
+        """Record a change to a guild's reaction roles and schedule a debounced save"""
+        # Every mutation ends here, so this keeps the indexes and list embed current
+        self._index_guild(guild_id)
+        self._list_embed_cache.pop(guild_id, None)
+        self._dirty_guilds.add(guild_id)
+        self._save_event.set()
+    
+    async def _save_worker(self):
+        """Save dirty guilds save_delay seconds after a change, coalescing any made in between"""
+        while True:
+            await self._save_event.wait()
+            await asyncio.sleep(self.save_delay)
+            self._save_event.clear()
+            await self.save_data()
+    
+    async def save_guild(self, guild_id: str):
+        """Save one guild's reaction role data to its shard"""
+        path = os.path.join(self.data_dir, f"{guild_id}.json")
         try:
-            with open(self.data_file, 'w') as f:
-                json.dump(self.reaction_roles, f)
+            guild_data = self.reaction_roles.get(guild_id)
+            # Serialize on the loop so the dict can't change mid-dump; hashing and disk I/O go to the writer thread
+            content = json_dumps(guild_data) if guild_data is not None else None
+            # Clear the mark before the write so a change made while it runs stays dirty
+            self._dirty_guilds.discard(guild_id)
+            digest = await asyncio.get_running_loop().run_in_executor(
+                self._io_executor, _write_shard, path, content, self._saved_digests.get(guild_id)
+            )
+            if digest is None:
+                self._saved_digests.pop(guild_id, None)
+            else:
+                self._saved_digests[guild_id] = digest
+            self._legacy_guilds.discard(guild_id)
         except Exception as e:
-            logger.error(f"Error saving reaction role data: {e}")
+            self._dirty_guilds.add(guild_id)
+            logger.error(f"Error saving reaction role data for guild {guild_id}: {e}")
+    
+    async def save_data(self):
+        """Save every guild with unsaved changes"""
+        for guild_id in list(self._dirty_guilds):
+            await self.save_guild(guild_id)
+        if self._legacy_file_pending and not self._legacy_guilds:
+            # Every guild now has its own shard, so the legacy file can be retired
+            try:
+                os.replace(self.data_file, self.data_file + '.migrated')
+                self._legacy_file_pending = False
+            except OSError as e:
+                logger.error(f"Error retiring {self.data_file}: {e}")
+    
+    async def _get_message(self, channel, message_id: int):
+        """Return a message from the bot's message cache, fetching it over REST only on a miss"""
+        message = discord.utils.get(self.bot.cached_messages, id=message_id)
+        if message and message.channel.id == channel.id:
+            return message
+        return await channel.fetch_message(message_id)
+    
+    async def find_message(self, guild, guild_id: str, message_id: str):
+        """Fetch a reaction role message from its stored channel, scanning the guild for older records"""
+        settings = self.reaction_roles.get(guild_id, {}).get(message_id, {}).get("settings")
+        channel_id = settings.get("channel_id") if isinstance(settings, dict) else None
+        if channel_id:
+            channel = guild.get_channel(int(channel_id))
+            if channel:
+                try:
+                    return await self._get_message(channel, int(message_id))
+                except discord.NotFound:
+                    return None
+                except discord.HTTPException:
+                    pass
+        for channel in guild.text_channels:
+            try:
+                message = await self._get_message(channel, int(message_id))
+            except Exception:
+                continue
+            # Remember where it lives so the next lookup is a single fetch
+            if isinstance(settings, dict):
+                settings["channel_id"] = str(channel.id)
+                self.mark_dirty(guild_id)
+            return message
+        return None
             
     @tasks.loop(minutes=5)
     async def save_task(self):
-        """Periodically save data"""
-        await self.save_data()
+        """Periodically retry saves that failed"""
+        if self._dirty_guilds:
+            await self.save_data()
         
     @save_task.before_loop
     async def before_save(self):
@@ -169,6 +340,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
                 
             self.reaction_roles[guild_id][message_id] = {
                 "settings": {
+                    "channel_id": str(channel.id),
                     "limit": None,
                     "required_roles": None,
                     "max_roles": None,
@@ -181,7 +353,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
                 }
             }
             
-            await self.save_data()
+            self.mark_dirty(guild_id)
             
             if style == "reactions":
                 await interaction.response.send_message(
@@ -280,6 +452,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
             self.reaction_roles[guild_id] = {}
         self.reaction_roles[guild_id][message_id] = {
             "settings": {
+                "channel_id": str(channel.id),
                 "limit": None,
                 "required_roles": None,
                 "max_roles": None,
@@ -304,7 +477,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
 
         # Attach buttons
         await self.update_button_message(guild_id, message_id, msg, channel)
-        await self.save_data()
+        self.mark_dirty(guild_id)
         await interaction.followup.send(f"Created button role panel in {channel.mention}.", ephemeral=True)
 
     @app_commands.command(name="add", description="Add a role to a reaction or button role message")
@@ -340,14 +513,9 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
                 message_id = message.strip()
             target_message = None
             try:
-                target_message = await interaction.channel.fetch_message(int(message_id))
+                target_message = await self._get_message(interaction.channel, int(message_id))
             except:
-                for ch in interaction.guild.text_channels:
-                    try:
-                        target_message = await ch.fetch_message(int(message_id))
-                        break
-                    except:
-                        continue
+                target_message = await self.find_message(interaction.guild, guild_id, message_id)
             if not target_message:
                 await interaction.response.send_message("Message not found. Provide a valid message ID or link.", ephemeral=True)
                 return
@@ -361,6 +529,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
         if message_id not in self.reaction_roles[guild_id]:
             self.reaction_roles[guild_id][message_id] = {
                 "settings": {
+                    "channel_id": str(target_message.channel.id),
                     "limit": None,
                     "required_roles": None,
                     "max_roles": None,
@@ -401,7 +570,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
         except Exception as e:
             logger.error(f"Error updating message with new role: {e}")
 
-        await self.save_data()
+        self.mark_dirty(guild_id)
         await interaction.response.send_message(
             f"Added mapping {emoji} → {role.mention} (mode: {mode})", ephemeral=True
         )
@@ -431,22 +600,16 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
             
             # Try to find the message to remove reaction
             try:
-                message_found = False
                 message = None
                 message_channel = None
                 
-                for channel in interaction.guild.text_channels:
-                    try:
-                        message = await channel.fetch_message(int(message_id))
-                        message_found = True
-                        message_channel = channel
-                        
-                        # Remove the reaction for reaction style
-                        if style == "reactions":
-                            await message.clear_reaction(emoji)
-                        break
-                    except:
-                        continue
+                message = await self.find_message(interaction.guild, guild_id, message_id)
+                if message:
+                    message_channel = message.channel
+                    
+                    # Remove the reaction for reaction style
+                    if style == "reactions":
+                        await message.clear_reaction(emoji)
             except Exception as e:
                 logger.error(f"Could not remove reaction from message: {e}")
             
@@ -468,7 +631,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
             if style == "buttons" and message and message_channel:
                 await self.update_button_message(guild_id, message_id, message, message_channel)
             
-            await self.save_data()
+            self.mark_dirty(guild_id)
             
             await interaction.response.send_message(
                 f"Removed reaction role: {emoji} → {role_name}", 
@@ -489,6 +652,11 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
         if guild_id not in self.reaction_roles or not self.reaction_roles[guild_id]:
             await interaction.response.send_message("No reaction roles set up in this server.", ephemeral=True)
             return
+        
+        embed = self._list_embed_cache.get(guild_id)
+        if embed:
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
             
         embed = discord.Embed(
             title="Reaction Roles",
@@ -520,6 +688,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
                     inline=False
                 )
         
+        self._list_embed_cache[guild_id] = embed
         await interaction.response.send_message(embed=embed, ephemeral=True)
     
     @app_commands.command(name="settings", description="Configure settings for a reaction role message")
@@ -559,7 +728,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
             if str(required_role.id) not in settings["required_roles"]:
                 settings["required_roles"].append(str(required_role.id))
         
-        await self.save_data()
+        self.mark_dirty(guild_id)
         
         # Prepare response message
         response = ["Updated reaction role settings:"]
@@ -598,16 +767,9 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
             return
             
         # Try to find the message
-        message_found = False
-        for channel in interaction.guild.text_channels:
-            try:
-                message = await channel.fetch_message(int(message_id))
-                message_found = True
-                break
-            except:
-                continue
+        message = await self.find_message(interaction.guild, guild_id, message_id)
                 
-        if not message_found:
+        if not message:
             await interaction.response.send_message(
                 "Message not found in any channel. It may have been deleted.",
                 ephemeral=True
@@ -668,7 +830,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
         # Update message
         try:
             await message.edit(embed=embed)
-            await self.save_data()
+            self.mark_dirty(guild_id)
             
             await interaction.response.send_message(
                 "Updated reaction role message embed.",
@@ -688,117 +850,121 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
         if payload.user_id == self.bot.user.id:
             return
             
-        guild_id = str(payload.guild_id)
-        message_id = str(payload.message_id)
-        emoji = payload.emoji.name
+        # Most reactions are on other messages; rule those out with a single int-keyed lookup
+        entries = self._role_index.get(payload.message_id)
+        if entries is None:
+            return
+        emoji = _emoji_key(payload.emoji)
+        if emoji not in entries:
+            return
+        entry = entries[emoji]
+        message_data = self._message_index[payload.message_id]
         
-        # Check if this is a reaction role
-        if (guild_id in self.reaction_roles and 
-            message_id in self.reaction_roles[guild_id] and 
-            emoji in self.reaction_roles[guild_id][message_id]):
+        try:
+            guild = self.bot.get_guild(payload.guild_id)
+            if not guild:
+                return
+                
+            member = guild.get_member(payload.user_id)
+            if not member:
+                return
             
-            try:
-                guild = self.bot.get_guild(payload.guild_id)
-                if not guild:
-                    return
+            # Role IDs the member has, for O(1) membership checks below
+            member_role_ids = {r.id for r in member.roles}
+                
+            # Check settings
+            settings = message_data["settings"]
+            
+            # Check required roles
+            if settings["required_roles"]:
+                has_required_role = any(int(role_id) in member_role_ids for role_id in settings["required_roles"])
+                        
+                if not has_required_role:
+                    # Remove reaction if they don't have required role
+                    channel = guild.get_channel(payload.channel_id)
+                    message = channel.get_partial_message(payload.message_id)
+                    await message.remove_reaction(payload.emoji, member)
                     
-                member = guild.get_member(payload.user_id)
-                if not member:
+                    # Try to DM user
+                    try:
+                        roles_str = ", ".join([f"<@&{role_id}>" for role_id in settings["required_roles"]])
+                        await member.send(f"You need one of these roles to use this reaction role: {roles_str}")
+                    except:
+                        pass
+                        
                     return
-                    
-                # Check settings
-                settings = self.reaction_roles[guild_id][message_id]["settings"]
-                
-                # Check required roles
-                if settings["required_roles"]:
-                    has_required_role = False
-                    for role_id in settings["required_roles"]:
-                        role = guild.get_role(int(role_id))
-                        if role and role in member.roles:
-                            has_required_role = True
-                            break
+            
+            # Check max roles
+            if settings["max_roles"]:
+                # Count how many roles from this message the user has
+                role_count = sum(1 for other in entries.values() if other.role_id in member_role_ids)
                             
-                    if not has_required_role:
-                        # Remove reaction if they don't have required role
-                        channel = guild.get_channel(payload.channel_id)
-                        message = await channel.fetch_message(payload.message_id)
-                        await message.remove_reaction(payload.emoji, member)
+                if role_count >= settings["max_roles"]:
+                    # Remove reaction if they've reached the limit
+                    channel = guild.get_channel(payload.channel_id)
+                    message = channel.get_partial_message(payload.message_id)
+                    await message.remove_reaction(payload.emoji, member)
+                    
+                    # Try to DM user
+                    try:
+                        await member.send(f"You can only have {settings['max_roles']} roles from this reaction role message.")
+                    except:
+                        pass
                         
-                        # Try to DM user
-                        try:
-                            roles_str = ", ".join([f"<@&{role_id}>" for role_id in settings["required_roles"]])
-                            await member.send(f"You need one of these roles to use this reaction role: {roles_str}")
-                        except:
-                            pass
-                            
-                        return
+                    return
+            
+            # Get role to add
+            role = guild.get_role(entry.role_id)
+            
+            if not role:
+                # Role doesn't exist anymore
+                return
                 
-                # Check max roles
-                if settings["max_roles"]:
-                    # Count how many roles from this message the user has
-                    role_count = 0
-                    for emoji_data in self.reaction_roles[guild_id][message_id].values():
-                        if isinstance(emoji_data, dict) and "role_id" in emoji_data:
-                            role = guild.get_role(int(emoji_data["role_id"]))
-                            if role and role in member.roles:
-                                role_count += 1
-                                
-                    if role_count >= settings["max_roles"]:
-                        # Remove reaction if they've reached the limit
-                        channel = guild.get_channel(payload.channel_id)
-                        message = await channel.fetch_message(payload.message_id)
-                        await message.remove_reaction(payload.emoji, member)
-                        
-                        # Try to DM user
-                        try:
-                            await member.send(f"You can only have {settings['max_roles']} roles from this reaction role message.")
-                        except:
-                            pass
+            # Handle different modes
+            if entry.mode == "unique":
+                # Remove other roles from this message
+                to_remove_ids = set()
+                emojis_to_clear = []
+                for emoji_key, other in entries.items():
+                    if emoji_key != emoji and other.role_id in member_role_ids and other.role_id != role.id:
+                        to_remove_ids.add(other.role_id)
+                        emojis_to_clear.append(emoji_key)
                             
-                        return
-                
-                # Get role to add
-                role_data = self.reaction_roles[guild_id][message_id][emoji]
-                role = guild.get_role(int(role_data["role_id"]))
-                
-                if not role:
-                    # Role doesn't exist anymore
-                    return
+                other_roles = [r for r in map(guild.get_role, to_remove_ids) if r]
+                if other_roles:
+                    await member.remove_roles(*other_roles, atomic=False)
                     
-                # Handle different modes
-                if role_data["mode"] == "unique":
-                    # Remove other roles from this message
-                    for emoji_key, other_role_data in self.reaction_roles[guild_id][message_id].items():
-                        if emoji_key != emoji and emoji_key != "settings" and "role_id" in other_role_data:
-                            other_role = guild.get_role(int(other_role_data["role_id"]))
-                            if other_role and other_role in member.roles:
-                                await member.remove_roles(other_role)
-                                
-                                # Also remove the user's reaction
-                                channel = guild.get_channel(payload.channel_id)
-                                message = await channel.fetch_message(payload.message_id)
-                                try:
-                                    await message.remove_reaction(emoji_key, member)
-                                except:
-                                    pass
-                elif role_data["mode"] == "exclusive":
-                    # Remove ALL other reaction roles from this server
-                    for other_msg_id, msg_data in self.reaction_roles[guild_id].items():
-                        for emoji_key, other_role_data in msg_data.items():
-                            if emoji_key != "settings" and "role_id" in other_role_data:
-                                if other_msg_id == message_id and emoji_key == emoji:
-                                    continue
-                                    
-                                other_role = guild.get_role(int(other_role_data["role_id"]))
-                                if other_role and other_role in member.roles:
-                                    await member.remove_roles(other_role)
-                
-                # Add the role
-                await member.add_roles(role)
+                if emojis_to_clear:
+                    # Also remove the user's reactions
+                    channel = guild.get_channel(payload.channel_id)
+                    message = channel.get_partial_message(payload.message_id)
+                    await asyncio.gather(
+                        *(message.remove_reaction(emoji_key, member) for emoji_key in emojis_to_clear),
+                        return_exceptions=True
+                    )
+            elif entry.mode == "exclusive":
+                # Remove ALL other reaction roles from this server
+                to_remove_ids = set()
+                for other_msg_id in self._indexed_messages.get(payload.guild_id, ()):
+                    for emoji_key, other in self._role_index[other_msg_id].items():
+                        if other_msg_id == payload.message_id and emoji_key == emoji:
+                            continue
+                        to_remove_ids.add(other.role_id)
                 
-            except Exception as e:
-                logger.error(f"Error handling reaction add: {e}")
-    
+                # The role being added stays even if another entry also maps to it
+                to_remove_ids &= member_role_ids
+                to_remove_ids.discard(role.id)
+                other_roles = [r for r in map(guild.get_role, to_remove_ids) if r]
+                if other_roles:
+                    # One PATCH for all of them instead of one request per role
+                    await member.remove_roles(*other_roles, atomic=False)
+            
+            # Add the role
+            await member.add_roles(role)
+            
+        except Exception as e:
+            logger.error(f"Error handling reaction add: {e}")
+
     @commands.Cog.listener()
     async def on_raw_reaction_remove(self, payload):
         """Handle reaction remove event"""
@@ -806,33 +972,42 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
         if payload.user_id == self.bot.user.id:
             return
             
-        guild_id = str(payload.guild_id)
-        message_id = str(payload.message_id)
-        emoji = payload.emoji.name
+        # Most reactions are on other messages; rule those out with a single int-keyed lookup
+        entries = self._role_index.get(payload.message_id)
+        if entries is None:
+            return
+        entry = entries.get(_emoji_key(payload.emoji))
+        if entry is None:
+            return
         
-        # Check if this is a reaction role
-        if (guild_id in self.reaction_roles and 
-            message_id in self.reaction_roles[guild_id] and 
-            emoji in self.reaction_roles[guild_id][message_id]):
+        try:
+            guild = self.bot.get_guild(payload.guild_id)
+            if not guild:
+                return
+                
+            member = guild.get_member(payload.user_id)
+            if not member:
+                return
+                
+            # Get role to remove; Member.get_role only returns roles the member has
+            role = member.get_role(entry.role_id)
             
-            try:
-                guild = self.bot.get_guild(payload.guild_id)
-                if not guild:
-                    return
-                    
-                member = guild.get_member(payload.user_id)
-                if not member:
-                    return
-                    
-                # Get role to remove
-                role_data = self.reaction_roles[guild_id][message_id][emoji]
-                role = guild.get_role(int(role_data["role_id"]))
+            if role:
+                await member.remove_roles(role)
                 
-                if role and role in member.roles:
-                    await member.remove_roles(role)
-                    
-            except Exception as e:
-                logger.error(f"Error handling reaction remove: {e}")
+        except Exception as e:
+            logger.error(f"Error handling reaction remove: {e}")
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        """Drop the cached list embed when a role it names is renamed"""
+        if before.name != after.name:
+            self._list_embed_cache.pop(str(after.guild.id), None)
+    
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        """Drop the cached list embed when a role it names is deleted"""
+        self._list_embed_cache.pop(str(role.guild.id), None)
 
     async def update_button_message(self, guild_id, message_id, message, channel):
         """Update a button style reaction role message with current buttons"""
@@ -861,23 +1036,20 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
             
             # Handle custom emoji format
             button_emoji = emoji
-            if emoji.startswith('<:') and emoji.endswith('>'):
-                try:
-                    # Extract emoji ID from format <:name:id>
-                    emoji_parts = emoji.strip('<>').split(':')
-                    if len(emoji_parts) >= 2:
-                        emoji_id = emoji_parts[-1]
-                        emoji_name = emoji_parts[1] if len(emoji_parts) > 2 else emoji_parts[0]
-                        button_emoji = discord.PartialEmoji(name=emoji_name, id=int(emoji_id))
-                except Exception as e:
-                    logger.error(f"Error parsing custom emoji {emoji}: {e}")
-                    # Fallback to text label if emoji can't be parsed
-                    button_emoji = None
-                    if not label:
-                        guild = self.bot.get_guild(int(guild_id))
-                        if guild:
-                            role = guild.get_role(int(role_id))
-                            label = role.name if role else f"Role {role_id}"
+            match = _CUSTOM_EMOJI_RE.fullmatch(emoji)
+            if match:
+                button_emoji = discord.PartialEmoji(
+                    name=match.group(2), id=int(match.group(3)), animated=bool(match.group(1))
+                )
+            elif emoji.startswith('<'):
+                logger.error(f"Error parsing custom emoji {emoji}")
+                # Fallback to text label if emoji can't be parsed
+                button_emoji = None
+                if not label:
+                    guild = self.bot.get_guild(int(guild_id))
+                    if guild:
+                        role = guild.get_role(int(role_id))
+                        label = role.name if role else f"Role {role_id}"
             
             # Create a button for this role
             try:
@@ -920,23 +1092,19 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
         missing_roles = 0
         invalid_emojis = 0
         
+        # Fetch every tracked message concurrently instead of one round-trip at a time
+        tracked = list(self.reaction_roles[guild_id].items())
+        results = await asyncio.gather(
+            *(self.find_message(interaction.guild, guild_id, message_id) for message_id, _ in tracked),
+            return_exceptions=True
+        )
+        
         # Check all messages and roles
-        for message_id, message_data in list(self.reaction_roles[guild_id].items()):
-            # Try to find the message
-            message_found = False
+        for (message_id, message_data), result in zip(tracked, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error finding message {message_id}: {result}")
             
-            try:
-                for channel in interaction.guild.text_channels:
-                    try:
-                        message = await channel.fetch_message(int(message_id))
-                        message_found = True
-                        break
-                    except:
-                        continue
-            except Exception as e:
-                logger.error(f"Error finding message {message_id}: {e}")
-            
-            if not message_found:
+            if result is None or isinstance(result, Exception):
                 issues_found += 1
                 missing_messages += 1
                 logger.warning(f"Message {message_id} not found in any channel")
@@ -996,7 +1164,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
         
         # Save changes
         if issues_fixed > 0:
-            await self.save_data()
+            self.mark_dirty(guild_id)
             
         # Generate report
         report = [
@@ -1016,8 +1184,6 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
 
     async def register_persistent_views(self):
         """Register persistent views for button-based reaction roles"""
-        await self.bot.wait_until_ready()
-        
         logger.info("Registering persistent reaction role views...")
         # Create a counter to track registered views
         registered_count = 0
@@ -1051,16 +1217,14 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
 
                             # Parse potential custom emoji markup
                             button_emoji = emoji
-                            if isinstance(emoji, str) and emoji.startswith('<:') and emoji.endswith('>'):
-                                try:
-                                    parts = emoji.strip('<>').split(':')
-                                    if len(parts) >= 2:
-                                        emoji_id = parts[-1]
-                                        emoji_name = parts[1] if len(parts) > 2 else parts[0]
-                                        button_emoji = discord.PartialEmoji(name=emoji_name, id=int(emoji_id))
-                                except Exception as e:
-                                    logger.error(f"Error parsing custom emoji {emoji}: {e}")
-                                    button_emoji = None
+                            match = _CUSTOM_EMOJI_RE.fullmatch(emoji) if isinstance(emoji, str) else None
+                            if match:
+                                button_emoji = discord.PartialEmoji(
+                                    name=match.group(2), id=int(match.group(3)), animated=bool(match.group(1))
+                                )
+                            elif isinstance(emoji, str) and emoji.startswith('<'):
+                                logger.error(f"Error parsing custom emoji {emoji}")
+                                button_emoji = None
                             
                             button = RoleButton(
                                 emoji=button_emoji,
@@ -1133,20 +1297,9 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
             found_count += 1
             
             # Try to find the message
-            message_found = False
-            message = None
-            message_channel = None
-            
-            for channel in interaction.guild.text_channels:
-                try:
-                    message = await channel.fetch_message(int(message_id))
-                    message_found = True
-                    message_channel = channel
-                    break
-                except:
-                    continue
+            message = await self.find_message(interaction.guild, guild_id, message_id)
                     
-            if not message_found:
+            if not message:
                 missing_count += 1
                 missing_messages.append(message_id)
                 continue
@@ -1175,7 +1328,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
             elif style == "buttons":
                 # For button style, update the message view
                 try:
-                    await self.update_button_message(guild_id, message_id, message, message_channel)
+                    await self.update_button_message(guild_id, message_id, message, message.channel)
                     updated_count += 1
                 except Exception as e:
                     logger.error(f"Error updating button message {message_id}: {e}")
@@ -1235,13 +1388,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
         style = message_data.get("settings", {}).get("style", "reactions")
         
         # Find original message to clone content
-        original_message = None
-        for ch in interaction.guild.text_channels:
-            try:
-                original_message = await ch.fetch_message(int(message_id))
-                break
-            except:
-                continue
+        original_message = await self.find_message(interaction.guild, guild_id, message_id)
                 
         if not original_message:
             await interaction.response.send_message("Could not find the original message to clone.", ephemeral=True)
@@ -1317,14 +1464,16 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
                 # Create data structure for the new message
                 new_message_id = str(new_message.id)
                 
-                # Clone the data
+                # Clone the data. A JSON round-trip deep-copies the nested categories far faster
+                # than copy.deepcopy, so edits to the clone never leak into the original.
                 self.reaction_roles[guild_id][new_message_id] = {
-                    "settings": message_data["settings"].copy()
+                    "settings": json_loads(json_dumps(message_data["settings"]))
                 }
+                self.reaction_roles[guild_id][new_message_id]["settings"]["channel_id"] = str(channel.id)
                 
                 # Update the menu message
                 await self.update_menu_message(guild_id, new_message_id, new_message)
-                await self.save_data()
+                self.mark_dirty(guild_id)
                 
                 await interaction.response.send_message(
                     f"Cloned role menu to {channel.mention}.", 
@@ -1335,17 +1484,11 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
             # Create data structure for the new message
             new_message_id = str(new_message.id)
             
-            self.reaction_roles[guild_id][new_message_id] = {}
-            
-            # Copy settings
-            self.reaction_roles[guild_id][new_message_id]["settings"] = message_data["settings"].copy()
+            # Deep-copy settings and role mappings in one JSON round-trip
+            self.reaction_roles[guild_id][new_message_id] = json_loads(json_dumps(message_data))
+            self.reaction_roles[guild_id][new_message_id]["settings"]["channel_id"] = str(channel.id)
             
-            # Copy role mappings
-            for emoji, role_data in message_data.items():
-                if emoji != "settings":
-                    self.reaction_roles[guild_id][new_message_id][emoji] = role_data.copy()
-            
-            await self.save_data()
+            self.mark_dirty(guild_id)
             
             await interaction.response.send_message(
                 f"Cloned reaction role message to {channel.mention}.", 
@@ -1386,13 +1529,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
             message_found = False
             
             try:
-                for channel in interaction.guild.text_channels:
-                    try:
-                        message = await channel.fetch_message(int(message_id))
-                        message_found = True
-                        break
-                    except:
-                        continue
+                message_found = await self.find_message(interaction.guild, guild_id, message_id) is not None
             except Exception as e:
                 logger.error(f"Error finding message {message_id}: {e}")
             
@@ -1434,7 +1571,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
             del self.reaction_roles[guild_id]
         
         # Save changes
-        await self.save_data()
+        self.mark_dirty(guild_id)
         
         # Generate report
         remaining_messages = initial_messages - removed_messages
@@ -1541,6 +1678,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
                 
             self.reaction_roles[guild_id][message_id] = {
                 "settings": {
+                    "channel_id": str(channel.id),
                     "limit": None,
                     "required_roles": None,
                     "max_roles": None,
@@ -1554,7 +1692,7 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
                 }
             }
             
-            await self.save_data()
+            self.mark_dirty(guild_id)
             
             await interaction.response.send_message(
                 f"Advanced role menu created in {channel.mention}. Use `/reaction add_category` to add role categories.", 
@@ -1609,18 +1747,12 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
             "roles": []
         }
         
-        await self.save_data()
+        self.mark_dirty(guild_id)
         
         # Update the menu message
         try:
             # Find the message
-            message = None
-            for channel in interaction.guild.text_channels:
-                try:
-                    message = await channel.fetch_message(int(message_id))
-                    break
-                except:
-                    continue
+            message = await self.find_message(interaction.guild, guild_id, message_id)
                     
             if message:
                 await self.update_menu_message(guild_id, message_id, message)
@@ -1705,18 +1837,12 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
         
         message_data["settings"]["categories"][category_id]["roles"].append(role_data)
         
-        await self.save_data()
+        self.mark_dirty(guild_id)
         
         # Update the menu message
         try:
             # Find the message
-            message = None
-            for channel in interaction.guild.text_channels:
-                try:
-                    message = await channel.fetch_message(int(message_id))
-                    break
-                except:
-                    continue
+            message = await self.find_message(interaction.guild, guild_id, message_id)
                     
             if message:
                 await self.update_menu_message(guild_id, message_id, message)
@@ -1865,18 +1991,12 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
             await interaction.response.send_message(f"Role {role.mention} not found in any menu category.", ephemeral=True)
             return
             
-        await self.save_data()
+        self.mark_dirty(guild_id)
         
         # Update the menu message
         try:
             # Find the message
-            message = None
-            for channel in interaction.guild.text_channels:
-                try:
-                    message = await channel.fetch_message(int(message_id))
-                    break
-                except:
-                    continue
+            message = await self.find_message(interaction.guild, guild_id, message_id)
                     
             if message:
                 await self.update_menu_message(guild_id, message_id, message)
@@ -1923,18 +2043,12 @@ class ReactionRoles(commands.GroupCog, name="reaction"):
         # Remove the category
         del message_data["settings"]["categories"][category_id]
         
-        await self.save_data()
+        self.mark_dirty(guild_id)
         
         # Update the menu message
         try:
             # Find the message
-            message = None
-            for channel in interaction.guild.text_channels:
-                try:
-                    message = await channel.fetch_message(int(message_id))
-                    break
-                except:
-                    continue
+            message = await self.find_message(interaction.guild, guild_id, message_id)
                     
             if message:
                 await self.update_menu_message(guild_id, message_id, message)
@@ -1979,14 +2093,10 @@ class RoleButton(discord.ui.Button):
         message_data = self.cog.reaction_roles[self.guild_id][self.message_id]
         settings = message_data["settings"]
         
-        # Check required roles
+        # Check required roles. Member.get_role is a lookup in the member's own role IDs,
+        # so none of these checks build the member.roles list.
         if settings["required_roles"]:
-            has_required_role = False
-            for role_id in settings["required_roles"]:
-                req_role = guild.get_role(int(role_id))
-                if req_role and req_role in member.roles:
-                    has_required_role = True
-                    break
+            has_required_role = any(member.get_role(int(role_id)) for role_id in settings["required_roles"])
             
             if not has_required_role:
                 roles_str = ", ".join([f"<@&{role_id}>" for role_id in settings["required_roles"]])
@@ -1999,14 +2109,13 @@ class RoleButton(discord.ui.Button):
         # Check max roles
         if settings["max_roles"]:
             # Count how many roles from this message the user has
-            role_count = 0
-            for emoji_data in message_data.values():
-                if isinstance(emoji_data, dict) and "role_id" in emoji_data:
-                    role = guild.get_role(int(emoji_data["role_id"]))
-                    if role and role in member.roles:
-                        role_count += 1
-            
-            if role_count >= settings["max_roles"] and role not in member.roles:
+            role_count = sum(
+                1 for emoji_data in message_data.values()
+                if isinstance(emoji_data, dict) and "role_id" in emoji_data
+                and member.get_role(int(emoji_data["role_id"]))
+            )
+            
+            if role_count >= settings["max_roles"] and not member.get_role(role.id):
                 await interaction.response.send_message(
                     f"You can only have {settings['max_roles']} roles from this message.",
                     ephemeral=True
@@ -2020,12 +2129,12 @@ class RoleButton(discord.ui.Button):
             for emoji, other_role_data in message_data.items():
                 if emoji != "settings" and "role_id" in other_role_data:
                     if other_role_data["role_id"] != self.role_id:
-                        other_role = guild.get_role(int(other_role_data["role_id"]))
-                        if other_role and other_role in member.roles:
+                        other_role = member.get_role(int(other_role_data["role_id"]))
+                        if other_role:
                             roles_to_remove.append(other_role)
             
             if roles_to_remove:
-                await member.remove_roles(*roles_to_remove)
+                await member.remove_roles(*roles_to_remove, atomic=False)
         
         elif self.mode == "exclusive":
             # Remove ALL other reaction roles
@@ -2036,16 +2145,16 @@ class RoleButton(discord.ui.Button):
                         if other_msg_id == self.message_id and other_role_data["role_id"] == self.role_id:
                             continue
                         
-                        other_role = guild.get_role(int(other_role_data["role_id"]))
-                        if other_role and other_role in member.roles:
+                        other_role = member.get_role(int(other_role_data["role_id"]))
+                        if other_role:
                             roles_to_remove.append(other_role)
             
             if roles_to_remove:
-                await member.remove_roles(*roles_to_remove)
+                await member.remove_roles(*roles_to_remove, atomic=False)
         
         # Toggle the role
         try:
-            if role in member.roles:
+            if member.get_role(role.id):
                 await member.remove_roles(role)
                 await interaction.response.send_message(f"Removed role: {role.mention}", ephemeral=True)
             else:
@@ -2119,9 +2228,10 @@ class RoleSelectMenu(discord.ui.Select):
         # Map of role IDs to their data
         role_data_map = {role["role_id"]: role for role in category_data["roles"]}
         
-        # Process selections
-        added_roles = []
-        removed_roles = []
+        # Work out every change first, then apply them with one PATCH each for removals and additions
+        member_role_ids = {r.id for r in member.roles}
+        to_add = []
+        to_remove_ids = set()
         
         for role_id, role_data in role_data_map.items():
             role = guild.get_role(int(role_id))
@@ -2131,7 +2241,7 @@ class RoleSelectMenu(discord.ui.Select):
             # Check if this role was selected or deselected
             if role_id in selected_role_ids:
                 # Role was selected - add it if not already there
-                if role not in member.roles:
+                if role.id not in member_role_ids:
                     # Check exclusive mode
                     if role_data.get("mode") == "exclusive":
                         # Remove all other reaction roles
@@ -2141,38 +2251,36 @@ class RoleSelectMenu(discord.ui.Select):
                                     for other_role_data in other_cat_data["roles"]:
                                         if other_msg_id == self.message_id and other_cat_id == self.category_id and other_role_data["role_id"] == role_id:
                                             continue
-                                            
-                                        other_role = guild.get_role(int(other_role_data["role_id"]))
-                                        if other_role and other_role in member.roles:
-                                            try:
-                                                await member.remove_roles(other_role)
-                                                removed_roles.append(other_role)
-                                            except:
-                                                pass
-                            elif "settings" in msg_data and emoji != "settings":
+                                        to_remove_ids.add(int(other_role_data["role_id"]))
+                            else:
                                 for emoji, emoji_data in msg_data.items():
                                     if emoji != "settings" and "role_id" in emoji_data:
-                                        other_role = guild.get_role(int(emoji_data["role_id"]))
-                                        if other_role and other_role in member.roles:
-                                            try:
-                                                await member.remove_roles(other_role)
-                                                removed_roles.append(other_role)
-                                            except:
-                                                pass
+                                        to_remove_ids.add(int(emoji_data["role_id"]))
                     
-                    # Add the role
-                    try:
-                        await member.add_roles(role)
-                        added_roles.append(role)
-                    except:
-                        pass
-            elif role in member.roles:
+                    to_add.append(role)
+            elif role.id in member_role_ids:
                 # Role was deselected - remove it
-                try:
-                    await member.remove_roles(role)
-                    removed_roles.append(role)
-                except:
-                    pass
+                to_remove_ids.add(role.id)
+        
+        # Only remove roles the member has, and never one that is being added
+        to_remove_ids &= member_role_ids
+        to_remove_ids.difference_update(role.id for role in to_add)
+        to_remove = [r for r in map(guild.get_role, to_remove_ids) if r]
+        
+        added_roles = []
+        removed_roles = []
+        if to_remove:
+            try:
+                await member.remove_roles(*to_remove, atomic=False)
+                removed_roles = to_remove
+            except:
+                pass
+        if to_add:
+            try:
+                await member.add_roles(*to_add, atomic=False)
+                added_roles = to_add
+            except:
+                pass
         
         # Send response
         response_parts = []
@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+import pytest
+
+discord = pytest.importorskip("discord")
+from discord.ext import commands
+
+import reactionroles
+
+
+def test_mark_dirty_writes_shard(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def run():
+        bot = commands.Bot(command_prefix="!", intents=discord.Intents.none())
+
+        async def ready():
+            pass
+
+        # The bot never logs in, so let save_task's before_loop go straight through
+        monkeypatch.setattr(bot, "wait_until_ready", ready)
+        cog = reactionroles.ReactionRoles(bot)
+        cog.save_delay = 0.01
+        await cog.cog_load()
+
+        cog.reaction_roles["123"] = {
+            "456": {"settings": {"style": "reactions"}, "👍": {"role_id": "789", "mode": "normal", "label": None}}
+        }
+        cog.mark_dirty("123")
+        await asyncio.sleep(0.5)
+
+        shard = tmp_path / "reaction_roles" / "123.json"
+        assert shard.exists()
+        assert json.loads(shard.read_bytes()) == cog.reaction_roles["123"]
+        assert not cog._dirty_guilds
+
+        save_loop = cog.save_task.get_task()
+        await cog.cog_unload()
+        await asyncio.gather(save_loop, cog._save_worker_task, return_exceptions=True)
+        assert not cog.save_task.is_running()
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+
+    asyncio.run(run())
+
+
+def test_partial_legacy_split_is_completed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    legacy = {"1": {"10": {"settings": {}}}, "2": {"20": {"settings": {}}}}
+    (tmp_path / "reaction_roles.json").write_text(json.dumps(legacy))
+    (tmp_path / "reaction_roles").mkdir()
+    # Guild 1 was split before the previous run stopped, and changed since
+    (tmp_path / "reaction_roles" / "1.json").write_text(json.dumps({"11": {"settings": {}}}))
+
+    async def run():
+        bot = commands.Bot(command_prefix="!", intents=discord.Intents.none())
+        cog = reactionroles.ReactionRoles(bot)
+        cog.save_task.cancel()
+        cog.load_data()
+
+        assert cog.reaction_roles == {"1": {"11": {"settings": {}}}, "2": {"20": {"settings": {}}}}
+        assert cog._dirty_guilds == {"2"}
+
+        await cog.save_data()
+        assert json.loads((tmp_path / "reaction_roles" / "2.json").read_bytes()) == legacy["2"]
+        assert not (tmp_path / "reaction_roles.json").exists()
+        assert (tmp_path / "reaction_roles.json.migrated").exists()
+        cog._io_executor.shutdown()
+
+    asyncio.run(run())